@@ -0,0 +1,199 @@
+#!/usr/bin/env python3
+"""
+Headless end-to-end benchmark for detectors and trackers.
+- Clips: generated scenes (gen:WxH:targets or any synth:// URL, see synth_source; deterministic,
+  moving balloons with GT boxes + IDs), synthetic splits (dir with images/ + labels/, GT boxes only) or recorded videos (no GT).
+- Detectors: cv (track_demo.detect_cv), shape (cv_color_shape_detect.detect), shape_p2/shape_p4
+  (pyramid), yolo:<weights> (.pt via ultralytics, .onnx via ONNX Runtime).
+- Trackers: SortLite variants (ema, kalman, ema_byte, kalman_byte) fed the detector output.
+- Reports throughput, p50/p95/p99 latency per stage, peak RSS (each clip x detector runs in
+  a fresh process), detection precision/recall and MOTA / ID switches against GT.
+- Results go to reports/bench/<commit>.json (+ .csv); --compare OLD.json prints the deltas.
+
+  python scripts/bench.py --res 640x360 1280x720 1920x1080 --targets 5 20 --det cv shape
+  python scripts/bench.py --compare reports/bench/<old commit>.json
+"""
+import argparse, csv, json, os, platform, resource, subprocess, time
+import multiprocessing as mp
+import numpy as np
+
+TRACKERS = {
+    "ema": dict(motion="ema"),
+    "kalman": dict(motion="kalman"),
+    "ema_byte": dict(motion="ema", high_thresh=0.5),
+    "kalman_byte": dict(motion="kalman", high_thresh=0.5),
+}
+
+def synth_clip(url, frames):
+    """Generated clip from synth_source: yields (BGR frame, GT Nx4 boxes, GT ids)."""
+    from synth_source import SynthSource
+    src = SynthSource.from_url(url)
+    for _ in range(frames):
+        ok, frame, boxes, ids = src.read_gt()
+        if not ok: break
+        yield frame, boxes, ids
+
+def open_clip(spec, frames):
+    if spec.startswith("gen:"):
+        _, res, n = spec.split(":")
+        return synth_clip(f"synth://{res}?n={n}&seed=0", frames)
+    if spec.startswith("synth://"): return synth_clip(spec, frames)
+    if os.path.isdir(spec):
+        import cv2
+        from utils import load_yolo_split, yolo_to_xyxy
+        def _split():
+            for p, gt in load_yolo_split(spec)[:frames]:
+                f = cv2.imread(p); yield f, yolo_to_xyxy(gt, f.shape[1], f.shape[0]), None
+        return _split()
+    import cv2
+    def _video():
+        cap = cv2.VideoCapture(spec)
+        for _ in range(frames):
+            ok, f = cap.read()
+            if not ok: break
+            yield f, None, None
+        cap.release()
+    return _video()
+
+def make_detector(name):
+    if name == "cv":
+        from track_demo import detect_cv
+        return detect_cv
+    if name.startswith("shape"):
+        from cv_color_shape_detect import detect
+        lvl = int(name[7:]) if name.startswith("shape_p") else 1
+        return lambda f: [b.xyxy + [1.0] for b in detect(f, pyramid=lvl)[0]]
+    if name.startswith("yolo:"):
+        from yolo_backend import yolo_predictor
+        return yolo_predictor(name[5:], conf=0.1)
+    raise ValueError(f"unknown detector {name}")
+
+def _pct(ms):
+    ms = np.asarray(ms, float)
+    if not len(ms): return {}
+    p50, p95, p99 = np.percentile(ms, [50, 95, 99])
+    return dict(mean=float(ms.mean()), p50=float(p50), p95=float(p95), p99=float(p99))
+
+def _det_quality(dets, gts, iou_thr=0.5):
+    from sort_tracker import iou_matrix, assign, split_dets
+    tp = n_det = n_gt = 0
+    for d, g in zip(dets, gts):
+        b, s = split_dets(d); b = b[s >= 0.5]
+        tp += len(assign(iou_matrix(g, b), iou_thr)[0]); n_det += len(b); n_gt += len(g)
+    return dict(precision=tp / max(n_det, 1), recall=tp / max(n_gt, 1))
+
+def _mot_quality(outputs, gts, gt_ids, iou_thr=0.5):
+    # CLEAR-MOT style counts: misses, false positives, identity switches → MOTA
+    from sort_tracker import iou_matrix, assign
+    fn = fp = idsw = n_gt = 0; last = {}
+    for out, g, ids in zip(outputs, gts, gt_ids):
+        tb = np.array([b for _, b, _ in out], float).reshape(-1, 4)
+        ti = [t for t, _, _ in out]
+        gi, tj = assign(iou_matrix(g, tb), iou_thr)
+        for a, b in zip(gi, tj):
+            gid = int(ids[a])
+            if gid in last and last[gid] != ti[b]: idsw += 1
+            last[gid] = ti[b]
+        fn += len(g) - len(gi); fp += len(tb) - len(tj); n_gt += len(g)
+    return dict(mota=1.0 - (fn + fp + idsw) / max(n_gt, 1), fn=fn, fp=fp, idsw=idsw)
+
+def run_one(clip, det_name, trackers, frames, warmup=5):
+    """One clip x detector (run in its own process so peak RSS is per configuration)."""
+    from sort_tracker import SortLite
+    det = make_detector(det_name)
+    det_ms, dets, gts, ids = [], [], [], []
+    for i, (frame, gt, gid) in enumerate(open_clip(clip, frames + warmup)):
+        t = time.perf_counter(); d = det(frame); dt = (time.perf_counter() - t) * 1000
+        if i < warmup: continue
+        det_ms.append(dt); dets.append(d); gts.append(gt); ids.append(gid)
+    res = dict(clip=clip, detector=det_name, frames=len(dets), det_ms=_pct(det_ms),
+               det_fps=1000 * len(det_ms) / max(sum(det_ms), 1e-9))
+    if dets and gts[0] is not None: res["det_quality"] = _det_quality(dets, gts)
+    res["trackers"] = {}
+    for tname in trackers if not os.path.isdir(clip) else []:  # split dirs are independent stills
+        tr = SortLite(**TRACKERS[tname]); trk_ms = []; outs = []
+        for d in dets:
+            t = time.perf_counter(); outs.append(tr.update(d)); trk_ms.append((time.perf_counter() - t) * 1000)
+        total = np.add(det_ms, trk_ms)
+        r = dict(trk_ms=_pct(trk_ms), total_ms=_pct(total), fps=1000 * len(total) / max(total.sum(), 1e-9))
+        if ids[0] is not None: r["mot"] = _mot_quality(outs, gts, ids)
+        res["trackers"][tname] = r
+    res["peak_rss_mb"] = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024  # KiB on Linux
+    return res
+
+def _commit():
+    try:
+        return subprocess.run(["git", "rev-parse", "--short", "HEAD"], capture_output=True, text=True,
+                              cwd=os.path.dirname(os.path.abspath(__file__))).stdout.strip() or "nogit"
+    except OSError:
+        return "nogit"
+
+def _rows(report):
+    # flat (key, metrics) rows used by the CSV and --compare
+    for r in report["results"]:
+        base = dict(det_p50_ms=r["det_ms"].get("p50"), det_p95_ms=r["det_ms"].get("p95"),
+                    det_fps=r["det_fps"], peak_rss_mb=r["peak_rss_mb"], **r.get("det_quality", {}))
+        if not r["trackers"]: yield (r["clip"], r["detector"], ""), base
+        for t, m in r["trackers"].items():
+            yield (r["clip"], r["detector"], t), dict(base, trk_p50_ms=m["trk_ms"]["p50"], trk_p99_ms=m["trk_ms"]["p99"],
+                                                      fps=m["fps"], **m.get("mot", {}))
+
+def compare(old_path, old, report):
+    old = dict(_rows(old))
+    print(f"\nvs {old_path}:")
+    for key, m in _rows(report):
+        if key not in old: continue
+        o = old[key]
+        parts = [f"{k} {o[k]:.3g}→{m[k]:.3g}" for k in ("fps", "det_fps", "recall", "mota", "peak_rss_mb")
+                 if k in m and k in o and m[k] is not None and o[k] is not None]
+        slow = "fps" in m and o.get("fps") and m["fps"] < 0.9 * o["fps"]
+        print(("  SLOWER " if slow else "  ") + " / ".join(filter(None, key)) + ": " + ", ".join(parts))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--det", nargs="+", default=["cv", "shape"], help="cv shape shape_p2 shape_p4 yolo:<weights>")
+    ap.add_argument("--trackers", nargs="+", default=["ema", "kalman"], choices=list(TRACKERS))
+    ap.add_argument("--res", nargs="+", default=["640x360", "1280x720", "1920x1080"], help="generated clip sizes")
+    ap.add_argument("--targets", type=int, nargs="+", default=[5, 20], help="targets per generated clip")
+    ap.add_argument("--clips", nargs="*", default=[], help="extra clips: synth:// URLs, video files or split dirs")
+    ap.add_argument("--frames", type=int, default=150)
+    ap.add_argument("--out", default="reports/bench", help="results dir (<commit>.json / .csv)")
+    ap.add_argument("--compare", default="", help="previous results JSON to diff against")
+    ap.add_argument("--inproc", action="store_true", help="run in this process (RSS is then cumulative)")
+    args = ap.parse_args()
+
+    old = json.load(open(args.compare)) if args.compare else None  # read first: same commit overwrites it
+    clips = [f"gen:{r}:{n}" for r in args.res for n in args.targets] + args.clips
+    jobs = [(c, d, args.trackers, args.frames) for c in clips for d in args.det]
+    results = []
+    pool = None if args.inproc else mp.get_context("spawn").Pool(1, maxtasksperchild=1)
+    for job in jobs:
+        r = run_one(*job) if pool is None else pool.apply(run_one, job)
+        results.append(r)
+        q = r.get("det_quality", {})
+        line = f"{r['clip']:>20s} {r['detector']:>8s}: det p50 {r['det_ms'].get('p50', 0):6.2f} ms " \
+               f"p99 {r['det_ms'].get('p99', 0):6.2f} ms  {r['det_fps']:6.1f} FPS  rss {r['peak_rss_mb']:.0f} MB"
+        if q: line += f"  P={q['precision']:.3f} R={q['recall']:.3f}"
+        print(line)
+        for t, m in r["trackers"].items():
+            mot = m.get("mot")
+            print(f"{'':>31s}{t:>12s}: trk p50 {m['trk_ms']['p50']:5.2f} ms p99 {m['trk_ms']['p99']:5.2f} ms  "
+                  f"e2e {m['fps']:6.1f} FPS" + (f"  MOTA={mot['mota']:.3f} IDSW={mot['idsw']}" if mot else ""))
+    if pool is not None: pool.close(); pool.join()
+
+    report = dict(commit=_commit(), time=time.strftime("%Y-%m-%dT%H:%M:%S"), frames=args.frames,
+                  machine=dict(platform=platform.platform(), python=platform.python_version(), cpus=os.cpu_count()),
+                  results=results)
+    os.makedirs(args.out, exist_ok=True)
+    path = os.path.join(args.out, f"{report['commit']}.json")
+    with open(path, "w") as f: json.dump(report, f, indent=2)
+    rows = list(_rows(report))
+    cols = sorted({k for _, m in rows for k in m})
+    with open(os.path.splitext(path)[0] + ".csv", "w", newline="") as f:
+        w = csv.writer(f); w.writerow(["clip", "detector", "tracker"] + cols)
+        for key, m in rows: w.writerow(list(key) + [m.get(c, "") for c in cols])
+    print(f"results → {path}")
+    if old: compare(args.compare, old, report)
+
+if __name__ == "__main__":
+    main()
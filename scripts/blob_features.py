@@ -0,0 +1,158 @@
+#!/usr/bin/env python3
+"""
+One feature-extraction pass per blob, shared by the detectors and the Stage-1/3 checks.
+- blobs_from_mask() gives every blob's area and bbox in one pass — all Stage-1 small/big and
+  tracking need — either from outer contours or, for raw masks full of specks, from
+  connectedComponentsWithStats with no contour tracing at all.
+- Blob records compute contour, perimeter, circularity, polygon approximation, shape and
+  color label lazily on first access, from the blob's own bbox crop, and keep them.
+- classify_shape() is the single shape rule (cv_color_shape_detect and shape_color_logic use it).
+- Run this file to time the fast path / full features against the old per-contour pass.
+"""
+import argparse, functools, time
+import cv2, numpy as np
+from color_segment import LABELS, get_lut
+
+APPROX_EPS = 0.03  # approxPolyDP epsilon as a fraction of the perimeter
+
+def shape_from(vertices, circularity):
+    # vertex count first: a square's circularity (pi/4 = 0.785) is above the old 0.7 circle cut
+    if vertices == 3: return "triangle"
+    if 4 <= vertices <= 6 and circularity < 0.82: return "square"
+    if vertices >= 8 or circularity > 0.7: return "circle"
+    if 4 <= vertices <= 6: return "square"
+    return "unknown"
+
+def classify_shape(contour):
+    peri = cv2.arcLength(contour, True)
+    if peri == 0: return "unknown"
+    approx = cv2.approxPolyDP(contour, APPROX_EPS * peri, True)
+    return shape_from(len(approx), 4*np.pi*cv2.contourArea(contour)/(peri*peri))
+
+class Blob:
+    """One blob: x, y, w, h (frame coords) and area up front; the rest is computed on first use.
+    area is contourArea for traced blobs and the pixel count for connected components."""
+    def __init__(self, x, y, w, h, area, dx=0, dy=0, contour=None, cc=None, k=0, colors=None):
+        self.x, self.y, self.w, self.h, self.area = int(x), int(y), int(w), int(h), float(area)
+        self._ox, self._oy = self.x - dx, self.y - dy  # bbox origin in the mask / label images
+        self._cc = cc; self._k = k; self._colors = colors
+        if contour is not None: self.contour = contour; self.contour_area = self.area
+        self.size = None  # "small" / "big", set by the detector's area threshold
+
+    @property
+    def xyxy(self):
+        return [self.x, self.y, self.x + self.w, self.y + self.h]
+
+    def _crop(self, a):
+        return a[self._oy:self._oy+self.h, self._ox:self._ox+self.w]
+
+    @functools.cached_property
+    def pixels(self):
+        if self._cc is not None: return self._crop(self._cc) == self._k
+        m = np.zeros((self.h, self.w), np.uint8)
+        cv2.drawContours(m, [self.contour], -1, 1, -1, offset=(-self.x, -self.y))
+        return m.view(bool)
+
+    @functools.cached_property
+    def contour(self):
+        # an 8-connected component has exactly one outer border
+        cs, _ = cv2.findContours(self.pixels.view(np.uint8), cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE,
+                                 offset=(self.x, self.y))
+        return max(cs, key=len)
+
+    @functools.cached_property
+    def contour_area(self):
+        return cv2.contourArea(self.contour)
+
+    @functools.cached_property
+    def perimeter(self):
+        return cv2.arcLength(self.contour, True)
+
+    @functools.cached_property
+    def circularity(self):
+        return 4*np.pi*self.contour_area/(self.perimeter**2) if self.perimeter else 0.0
+
+    @functools.cached_property
+    def approx(self):
+        return cv2.approxPolyDP(self.contour, APPROX_EPS * self.perimeter, True)
+
+    @functools.cached_property
+    def shape(self):
+        return shape_from(len(self.approx), self.circularity) if self.perimeter else "unknown"
+
+    @functools.cached_property
+    def color_votes(self):
+        # color label counts (LABELS order) of the blob's own pixels; "none" (filled by closing) ignored
+        if self._colors is None: return np.zeros(len(LABELS), np.int64)
+        n = np.bincount(self._crop(self._colors)[self.pixels], minlength=len(LABELS)); n[0] = 0
+        return n
+
+    @property
+    def color(self):
+        n = self.color_votes
+        return LABELS[int(n.argmax())] if n.any() else "unknown"
+
+    @property
+    def color_conf(self):
+        n = self.color_votes
+        return float(n.max() / n.sum()) if n.any() else 0.0
+
+def blobs_from_mask(mask, min_area=0, colors=None, dx=0, dy=0, method="contours"):
+    """Blob records of a binary mask's outer blobs with area >= min_area.
+    colors: the matching per-pixel LUT label image (for Blob.color); dx, dy: offset of the mask.
+    method="contours" traces borders (cheapest on cleaned-up masks with few blobs);
+    "components" labels the whole mask with connectedComponentsWithStats and filters the
+    area/bbox table in one array op, which wins on raw masks with thousands of specks."""
+    if method == "components":
+        _, cc, stats, _ = cv2.connectedComponentsWithStatsWithAlgorithm(mask, 8, cv2.CV_32S, cv2.CCL_GRANA)
+        keep = np.nonzero(stats[1:, cv2.CC_STAT_AREA] >= min_area)[0] + 1
+        return [Blob(x+dx, y+dy, w, h, a, dx, dy, cc=cc, k=k, colors=colors)
+                for k, (x, y, w, h, a) in zip(keep.tolist(), stats[keep].tolist())]
+    blobs = []
+    for c in cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE, offset=(dx, dy))[0]:
+        a = cv2.contourArea(c)
+        if a >= min_area: blobs.append(Blob(*cv2.boundingRect(c), a, dx, dy, contour=c, colors=colors))
+    return blobs
+
+def _legacy(mask, min_area):
+    # the old per-contour pass: area twice, boundingRect, arcLength, approxPolyDP
+    out = []
+    for c in cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)[0]:
+        if cv2.contourArea(c) < min_area: continue
+        x, y, w, h = cv2.boundingRect(c)
+        peri = cv2.arcLength(c, True); approx = cv2.approxPolyDP(c, APPROX_EPS * peri, True)
+        area = cv2.contourArea(c)
+        out.append((x, y, w, h, len(approx), 4*np.pi*area/(peri*peri) if peri else 0.0))
+    return out
+
+def main():
+    ap = argparse.ArgumentParser(description="Blob features: record fast paths vs the old per-contour pass")
+    ap.add_argument("--source", default="synth://1280x720?n=50")
+    ap.add_argument("--frames", type=int, default=100)
+    ap.add_argument("--noise", type=float, default=0.0, help="fraction of random mask specks (unfiltered mask)")
+    args = ap.parse_args()
+    from synth_source import SynthSource
+    src = SynthSource.from_url(args.source); lut = get_lut(); rng = np.random.default_rng(0)
+    t = {}; agree = total = 0
+    def timed(name, fn):
+        s = time.perf_counter(); r = fn(); t[name] = t.get(name, 0.0) + time.perf_counter() - s
+        return r
+    for _ in range(args.frames):
+        ok, frame, gt, gid = src.read_gt()
+        if not ok: break
+        colors = lut.labels(frame); mask = lut.mask_from_labels(colors)
+        if args.noise: mask[rng.random(mask.shape) < args.noise] = 255
+        timed("old contour pass", lambda: _legacy(mask, 150))
+        timed("contours bbox/area", lambda: blobs_from_mask(mask, 150, colors))
+        timed("components bbox/area", lambda: blobs_from_mask(mask, 150, colors, method="components"))
+        blobs = timed("contours + shape + color", lambda: [(b, b.shape, b.color) for b in blobs_from_mask(mask, 150, colors)])
+        for b, shape, _ in blobs:  # shapes vs ground truth (blob center inside exactly one GT box)
+            cx, cy = b.x + b.w / 2, b.y + b.h / 2
+            hit = np.nonzero((gt[:, 0] <= cx) & (cx <= gt[:, 2]) & (gt[:, 1] <= cy) & (cy <= gt[:, 3]))[0]
+            if len(hit) == 1: agree += shape == src.shapes[gid[hit[0]]]; total += 1
+    k = max(args.frames, 1)
+    print("  ".join(f"{name} {v*1000/k:.2f} ms" for name, v in t.items()) +
+          f"  (per frame; shape correct {agree/max(total,1)*100:.1f}%)")
+
+if __name__ == "__main__":
+    main()
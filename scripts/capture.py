@@ -0,0 +1,99 @@
+#!/usr/bin/env python3
+"""
+Threaded capture front-end shared by all live scripts.
+- A background thread calls cap.read() into a small ring buffer, so decode/USB
+  latency no longer stacks with detection time.
+- Live sources (webcam index) drop the oldest frames and hand out the freshest one;
+  files default to "no-drop" mode (producer waits) so every frame is processed.
+- Each frame carries its capture timestamp (time.monotonic) and a dropped-frame counter.
+- synth://... sources are rendered in memory by synth_source.SynthSource (no camera needed).
+"""
+import threading, time, collections
+import cv2
+
+def parse_source(source):
+    # "0" / 0 → webcam index, anything else → path/URL (incl. synth://)
+    if isinstance(source, int): return source
+    return int(source) if str(source).isdigit() else source
+
+def open_capture(source):
+    """Open a raw cv2.VideoCapture-like object for a --source string."""
+    src = parse_source(source)
+    if isinstance(src, str) and src.startswith("synth://"):
+        from synth_source import SynthSource
+        return SynthSource.from_url(src)
+    return cv2.VideoCapture(src)
+
+class CaptureSource:
+    """cv2.VideoCapture drop-in whose read() never blocks on the device."""
+    def __init__(self, source, buffer=2, drop=None):
+        src = parse_source(source)
+        self.cap = source if hasattr(source, "read") else open_capture(src)
+        self.live = isinstance(src, int) or getattr(self.cap, "live", False)
+        self.drop = self.live if drop is None else drop
+        if self.drop:
+            # Keep the driver queue short too, otherwise stale frames pile up there
+            self.cap.set(cv2.CAP_PROP_BUFFERSIZE, 1)
+        self.buf = collections.deque(maxlen=max(1, buffer))
+        self.cond = threading.Condition()
+        self.dropped = 0
+        self.captured = 0
+        self.last_ts = 0.0
+        self._eof = False
+        self._stop = False
+        self._thread = None
+        if self.cap.isOpened():
+            self._thread = threading.Thread(target=self._run, name="capture", daemon=True)
+            self._thread.start()
+
+    def _run(self):
+        while not self._stop:
+            ok, frame = self.cap.read()
+            ts = time.monotonic()
+            with self.cond:
+                if not ok:
+                    self._eof = True; self.cond.notify_all(); return
+                if not self.drop:
+                    while len(self.buf) == self.buf.maxlen and not self._stop:
+                        self.cond.wait(0.1)
+                elif len(self.buf) == self.buf.maxlen:
+                    self.dropped += 1  # deque(maxlen) evicts the oldest
+                self.buf.append((frame, ts))
+                self.captured += 1
+                self.cond.notify_all()
+
+    def isOpened(self):
+        return self.cap.isOpened()
+
+    def read_stamped(self, timeout=2.0):
+        """Return (ok, frame, capture_ts). Live mode skips to the newest buffered frame."""
+        with self.cond:
+            if not self.buf and not self._eof:
+                self.cond.wait_for(lambda: self.buf or self._eof, timeout)
+            if not self.buf:
+                return False, None, 0.0
+            if self.drop:
+                frame, ts = self.buf.pop()
+                self.dropped += len(self.buf); self.buf.clear()
+            else:
+                frame, ts = self.buf.popleft()
+            self.cond.notify_all()
+        self.last_ts = ts
+        return True, frame, ts
+
+    def read(self):
+        ok, frame, _ = self.read_stamped()
+        return ok, frame
+
+    def age(self):
+        """Seconds since the last returned frame was captured (glass-to-now latency)."""
+        return time.monotonic() - self.last_ts if self.last_ts else 0.0
+
+    def get(self, prop):
+        return self.cap.get(prop)
+
+    def release(self):
+        self._stop = True
+        with self.cond: self.cond.notify_all()
+        if self._thread is not None: self._thread.join(timeout=1.0)
+        self.cap.release()
@@ -0,0 +1,130 @@
+#!/usr/bin/env python3
+"""
+Shared color segmentation engine (BGR → color label in one table lookup).
+- HSV thresholds are baked once into a quantized BGR→label lookup table,
+  so a frame is segmented without cvtColor/inRange/bitwise_or per frame.
+- Labels: 0=none, 1=red, 2=blue, 3=green (see LABELS).
+- Run this file directly to benchmark against the legacy HSV path.
+"""
+import argparse, time
+import cv2, numpy as np
+
+# HSV ranges (BGR→HSV) — tune for lighting. Values cover common reds, blues, greens.
+# Keys ending in a digit are merged into one label (red1 + red2 → red).
+HSV_RANGES = {
+    "red1": ((0, 90, 80), (10, 255, 255)),     # lower red
+    "red2": ((170, 90, 80), (180, 255, 255)),  # upper red
+    "blue": ((95, 80, 60), (130, 255, 255)),
+    "green": ((40, 60, 60), (85, 255, 255)),
+}
+
+LABELS = ("none", "red", "blue", "green")
+LABEL_ID = {name: i for i, name in enumerate(LABELS)}
+
+class ColorLUT:
+    """Quantized BGR→label table. bits=5 → 32^3 entries (32 KB, cache resident)."""
+    def __init__(self, ranges=HSV_RANGES, bits=5):
+        self.bits = bits
+        self.shift = 8 - bits
+        n = 1 << bits
+        # Bin centers for every quantized (b,g,r) triple, laid out in index order
+        centers = (np.arange(n, dtype=np.uint16) << self.shift) + (1 << self.shift) // 2
+        centers = np.clip(centers, 0, 255).astype(np.uint8)
+        b, g, r = np.meshgrid(centers, centers, centers, indexing="ij")
+        bgr = np.stack([b, g, r], axis=-1).reshape(-1, 1, 3)
+        hsv = cv2.cvtColor(bgr, cv2.COLOR_BGR2HSV)
+        table = np.zeros(n**3, dtype=np.uint8)
+        for key, (lo, hi) in ranges.items():
+            lab = LABEL_ID[key.rstrip("0123456789")]
+            hit = cv2.inRange(hsv, np.array(lo), np.array(hi)).reshape(-1) > 0
+            table[hit & (table == 0)] = lab  # first matching range wins
+        self.table = table
+        self._mask_tables = {}
+        self._idx_dtype = np.uint16 if 3 * bits <= 16 else np.uint32
+
+    def index(self, bgr):
+        # idx = (b>>s)<<2k | (g>>s)<<k | (r>>s), built in place (uint16 for bits<=5)
+        q = np.right_shift(bgr, self.shift)
+        idx = q[..., 0].astype(self._idx_dtype)
+        idx <<= self.bits; idx |= q[..., 1]
+        idx <<= self.bits; idx |= q[..., 2]
+        return idx
+
+    def labels(self, bgr):
+        """Per-pixel label image (uint8, HxW) with ids from LABELS."""
+        return np.take(self.table, self.index(bgr))
+
+    def mask_table(self, colors=None):
+        key = tuple(colors) if colors else None
+        t = self._mask_tables.get(key)
+        if t is None:
+            ids = [LABEL_ID[c] for c in colors] if colors else range(1, len(LABELS))
+            t = np.where(np.isin(self.table, list(ids)), 255, 0).astype(np.uint8)
+            self._mask_tables[key] = t
+        return t
+
+    def mask(self, bgr, colors=None):
+        """Binary 0/255 mask of the given colors (default: any labelled color)."""
+        return np.take(self.mask_table(colors), self.index(bgr))
+
+    def mask_from_labels(self, labels, colors=None):
+        ids = [LABEL_ID[c] for c in colors] if colors else None
+        if ids is None:
+            return cv2.compare(labels, 0, cv2.CMP_GT)
+        m = np.isin(labels, ids)
+        return m.astype(np.uint8) * 255
+
+_LUTS = {}
+
+def get_lut(ranges=HSV_RANGES, bits=5):
+    """Shared, lazily built table per (ranges, bits) so call sites don't rebuild it."""
+    key = (tuple(sorted((k, tuple(lo), tuple(hi)) for k, (lo, hi) in ranges.items())), bits)
+    lut = _LUTS.get(key)
+    if lut is None:
+        lut = _LUTS[key] = ColorLUT(ranges, bits)
+    return lut
+
+def legacy_mask(frame, ranges=HSV_RANGES):
+    # Reference path: what every detector did before the LUT
+    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
+    m = None
+    for lo, hi in ranges.values():
+        x = cv2.inRange(hsv, np.array(lo), np.array(hi))
+        m = x if m is None else cv2.bitwise_or(m, x)
+    return m
+
+def main():
+    ap = argparse.ArgumentParser(description="Benchmark LUT segmentation vs. HSV inRange path")
+    ap.add_argument("--source", default="", help="optional image/video to sample frames from (default: synthetic)")
+    ap.add_argument("--bits", type=int, default=5)
+    ap.add_argument("--iters", type=int, default=50)
+    args = ap.parse_args()
+
+    base = None
+    if args.source:
+        cap = cv2.VideoCapture(args.source); ok, base = cap.read(); cap.release()
+        if not ok: print("ERROR: Cannot read source"); return
+    t = time.perf_counter(); lut = get_lut(bits=args.bits)
+    print(f"LUT build: {(time.perf_counter()-t)*1000:.1f} ms  ({lut.table.size} entries)")
+
+    for name, (W, H) in (("720p", (1280, 720)), ("1080p", (1920, 1080))):
+        if base is not None:
+            frame = cv2.resize(base, (W, H))
+        else:
+            rng = np.random.default_rng(0)
+            frame = cv2.GaussianBlur(rng.integers(0, 256, (H, W, 3), dtype=np.uint8), (0, 0), 3)
+            frame = cv2.normalize(frame, None, 0, 255, cv2.NORM_MINMAX)
+        res = {}
+        for label, fn in (("hsv+inRange", lambda: legacy_mask(frame)),
+                          ("lut mask", lambda: lut.mask(frame)),
+                          ("lut labels", lambda: lut.labels(frame))):
+            fn()
+            t = time.perf_counter()
+            for _ in range(args.iters): fn()
+            res[label] = (time.perf_counter() - t) * 1000 / args.iters
+        agree = (legacy_mask(frame) > 0) == (lut.mask(frame) > 0)
+        print(f"{name}: " + "  ".join(f"{k}={v:.2f} ms" for k, v in res.items())
+              + f"  agreement={agree.mean()*100:.2f}%")
+
+if __name__ == "__main__":
+    main()
@@ -1,87 +1,113 @@
 #!/usr/bin/env python3
 """
 Classic CV pipeline for detecting colored balloon-like shapes and classifying their shape.
-- HSV thresholds for colors (tunable).
-- Morphological cleanup and contour analysis.
-- Polygon approx for shape classification (circle/square/triangle).
-- Area threshold for small/big.
-- Designed to work on webcam or video files.
+- HSV thresholds for colors (tunable), baked into a shared BGR→label LUT (color_segment).
+- Morphological cleanup, then one blob_features pass: each detection is a Blob record
+  (bbox/area up front; perimeter, polygon approx, shape and color computed once, on demand).
+- Polygon approx for shape classification (circle/square/triangle), blob_features.classify_shape.
+- Area threshold for small/big (needs only bbox/area: no perimeter/approx work).
+- Optional pyramid mode: find candidate blobs on a 2x/4x downscaled frame, then refine
+  boxes and classify shapes on full-resolution crops only (--pyramid 2|4).
+- Designed to work on webcam or video files; --eval DIR compares speed/recall per
+  pyramid level on a synthetic split (images/ + YOLO labels/).
+- Per-stage timings via instrument.PROF: --prof FILE exports p50/p95/p99, --hud draws them.
 """
 import cv2, argparse, numpy as np, time
+from color_segment import HSV_RANGES, get_lut
+from capture import CaptureSource
+from roi_detect import merge_windows
+from sort_tracker import iou_matrix, assign
+from utils import load_yolo_split, yolo_to_xyxy
+from instrument import PROF
+from blob_features import blobs_from_mask, classify_shape
 
-# HSV ranges (BGR→HSV) — tune for lighting. Values cover common reds, blues, greens.
-HSV_RANGES = {
-    "red1": ((0, 90, 80), (10, 255, 255)),     # lower red
-    "red2": ((170, 90, 80), (180, 255, 255)),  # upper red
-    "blue": ((95, 80, 60), (130, 255, 255)),
-    "green": ((40, 60, 60), (85, 255, 255)),
-}
+MIN_AREA = 150  # px at full resolution
 
-def classify_shape(contour):
-    # Approximate polygon and use vertex count + circularity to infer shape
-    peri = cv2.arcLength(contour, True)
-    approx = cv2.approxPolyDP(contour, 0.03 * peri, True)
-    area = cv2.contourArea(contour)
-    if peri == 0: return "unknown"
-    circularity = 4*np.pi*(area/(peri*peri))
-    if len(approx) >= 8 or circularity > 0.7:
-        return "circle"
-    elif len(approx) == 3:
-        return "triangle"
-    elif 4 <= len(approx) <= 6:
-        return "square"
-    return "unknown"
+def mask_color(frame):
+    # Union of all HSV_RANGES colors straight from BGR (one LUT pass, no HSV conversion)
+    return get_lut(HSV_RANGES).mask(frame)
 
-def mask_color(hsv):
-    masks = []
-    for k,(lo,hi) in HSV_RANGES.items():
-        lo=np.array(lo); hi=np.array(hi)
-        masks.append(cv2.inRange(hsv, lo, hi))
-    # Note: red split into two parts; 'red1' + 'red2' will both be ORed here with other colors.
-    m = masks[0]
-    for i in range(1,len(masks)):
-        m = cv2.bitwise_or(m, masks[i])
-    return m
+def find_blobs(frame, min_area=MIN_AREA, dx=0, dy=0, method="contours"):
+    # labels → mask → open/close → Blob records with area >= min_area; returns (mask, blobs)
+    with PROF.span("masking"):
+        colors = get_lut(HSV_RANGES).labels(frame)  # kept for Blob.color
+        m = get_lut(HSV_RANGES).mask_from_labels(colors)
+    with PROF.span("morphology"):
+        m = cv2.morphologyEx(m, cv2.MORPH_OPEN, np.ones((3,3),np.uint8), iterations=1)
+        m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, np.ones((5,5),np.uint8), iterations=1)
+    with PROF.span("contours"): blobs = blobs_from_mask(m, min_area, colors, dx, dy, method)
+    return m, blobs
+
+def detect(frame, area_small=1200.0, pyramid=1, method="contours"):
+    """Detections as Blob records (x, y, w, h, size; shape / color on first access) plus the mask
+    used for the first stage. pyramid>1 searches a downscaled frame (thresholds scaled by
+    1/pyramid^2) and only re-segments full-resolution crops around the candidates."""
+    if pyramid <= 1:
+        m, dets = find_blobs(frame, method=method)
+    else:
+        H, W = frame.shape[:2]
+        small = cv2.resize(frame, (W//pyramid, H//pyramid), interpolation=cv2.INTER_AREA)
+        m, blobs = find_blobs(small, min_area=MIN_AREA/(pyramid*pyramid), method=method)
+        pad = 2*pyramid + 2
+        wins = [[max(0, b.x*pyramid-pad), max(0, b.y*pyramid-pad),
+                 min(W, (b.x+b.w)*pyramid+pad), min(H, (b.y+b.h)*pyramid+pad)] for b in blobs]
+        dets = []
+        for x1,y1,x2,y2 in merge_windows(wins):
+            dets += find_blobs(frame[y1:y2, x1:x2], dx=x1, dy=y1, method=method)[1]
+    for b in dets: b.size = "small" if b.area < area_small else "big"
+    return dets, m
+
+def evaluate(root, levels=(1, 2, 4), area_small=1200.0, iou_thr=0.5):
+    items = load_yolo_split(root)
+    if not items: print(f"ERROR: no images under {root}/images"); return
+    frames = [(cv2.imread(p), gt) for p, gt in items]
+    for lvl in levels:
+        t = 0.0; tp = 0; n_gt = 0; n_det = 0
+        for frame, gt in frames:
+            H, W = frame.shape[:2]
+            s = time.perf_counter(); dets, _ = detect(frame, area_small, lvl); t += time.perf_counter() - s
+            g = yolo_to_xyxy(gt, W, H)
+            d = np.array([b.xyxy for b in dets]).reshape(-1, 4)
+            tp += len(assign(iou_matrix(g, d), iou_thr)[0]); n_gt += len(g); n_det += len(d)
+        print(f"pyramid {lvl}: {t*1000/len(frames):6.2f} ms/img  recall={tp/max(n_gt,1):.3f}  "
+              f"precision={tp/max(n_det,1):.3f}  ({len(frames)} imgs)")
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--source", default="0", help="0 for webcam or path to video")
     ap.add_argument("--area_small", type=float, default=1200.0, help="area threshold for small vs big")
     ap.add_argument("--show_mask", action="store_true")
+    ap.add_argument("--pyramid", type=int, choices=[1,2,4], default=1, help="coarse search downscale factor")
+    ap.add_argument("--blobs", choices=["contours","components"], default="contours",
+                    help="blob extraction: contour tracing, or connected components (raw masks with many specks)")
+    ap.add_argument("--eval", default="", help="synthetic split dir (e.g. data/synth_samples/val) → speed/recall per level")
+    ap.add_argument("--prof", default="", help="write per-stage latency percentiles at exit (.json or .csv)")
+    ap.add_argument("--hud", action="store_true", help="draw per-stage p50/p95/p99 on the frame")
     args = ap.parse_args()
 
-    cap = cv2.VideoCapture(0 if args.source=="0" else args.source)
+    if args.eval:
+        evaluate(args.eval, area_small=args.area_small); return
+
+    cap = CaptureSource(args.source)
     if not cap.isOpened():
         print("ERROR: Cannot open source"); return
 
-    last = time.time(); frames=0
+    PROF.enable()  # frame timing drives the FPS readout; spans cost well under 1%
     while True:
-        ok, frame = cap.read()
+        PROF.frame()
+        with PROF.span("capture"): ok, frame = cap.read()
         if not ok: break
-        hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-
-        m = mask_color(hsv)
-        m = cv2.morphologyEx(m, cv2.MORPH_OPEN, np.ones((3,3),np.uint8), iterations=1)
-        m = cv2.morphologyEx(m, cv2.MORPH_CLOSE, np.ones((5,5),np.uint8), iterations=1)
-
-        contours, _ = cv2.findContours(m, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-        for c in contours:
-            area = cv2.contourArea(c)
-            if area < 150: continue
-            x,y,w,h = cv2.boundingRect(c)
-            shape = classify_shape(c)
-            size = "small" if area < args.area_small else "big"
-            cv2.rectangle(frame,(x,y),(x+w,y+h),(0,255,0),2)
-            cv2.putText(frame,f"{shape}/{size}",(x,y-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,255,0),1,cv2.LINE_AA)
-
-        frames+=1
-        now=time.time()
-        if now-last>1.0:
-            fps=frames/(now-last); frames=0; last=now
-            cv2.putText(frame,f"FPS {fps:.1f}",(10,22),cv2.FONT_HERSHEY_SIMPLEX,0.6,(0,255,255),2,cv2.LINE_AA)
+        dets, m = detect(frame, args.area_small, args.pyramid, args.blobs)
+        with PROF.span("classify"): shapes = [b.shape for b in dets]  # perimeter/approx only here
+        with PROF.span("drawing"):
+            for b, shape in zip(dets, shapes):
+                cv2.rectangle(frame,(b.x,b.y),(b.x+b.w,b.y+b.h),(0,255,0),2)
+                cv2.putText(frame,f"{shape}/{b.size}",(b.x,b.y-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,255,0),1,cv2.LINE_AA)
+            cv2.putText(frame,f"FPS {PROF.fps():.1f}",(10,22),cv2.FONT_HERSHEY_SIMPLEX,0.6,(0,255,255),2,cv2.LINE_AA)
+            if args.hud: PROF.draw(frame)
 
         if args.show_mask:
-            vis = cv2.cvtColor(m, cv2.COLOR_GRAY2BGR)
+            vis = cv2.cvtColor(cv2.resize(m, (frame.shape[1], frame.shape[0]), interpolation=cv2.INTER_NEAREST), cv2.COLOR_GRAY2BGR)
             out = np.hstack([frame, vis])
         else:
             out = frame
@@ -89,6 +115,8 @@ def main():
         if cv2.waitKey(1)&0xFF==27: break
 
     cap.release(); cv2.destroyAllWindows()
+    if args.prof:
+        PROF.dump(args.prof); print(f"profile → {args.prof} (overhead {PROF.overhead_pct():.2f}%)")
 
 if __name__ == "__main__":
     main()
@@ -6,10 +6,18 @@ Enhanced synthetic dataset generator for balloon targets with improved realism.
 - Occlusion handling and motion blur
 - Color variations and lighting effects
 - Size variations based on distance simulation
+- Parallel (--workers), deterministic per-image seeding, meta.jsonl streaming and resume (gen_pool)
+- Render cache (default on, --bank 0 disables): a bank of pre-rendered sky backgrounds
+  (optionally a memory-mapped .npy shared by all workers) and a sprite atlas of balloons per
+  shape / color variant / radius, pasted with their masks; labels stay exact.
+  --bench compares images/sec with and without the cache.
 """
-import os, json, argparse, random, math
+import os, argparse, random, math, time, tempfile, shutil
+from functools import partial
 from PIL import Image, ImageDraw, ImageFilter, ImageOps, ImageEnhance
 import numpy as np
+from gen_pool import generate, add_args
+from synthetic_generator import render_sprite
 
 # Enhanced color palette with variations
 COLORS = {
@@ -20,26 +28,17 @@ COLORS = {
 
 SHAPES = ["circle", "square", "triangle"]
 
-def create_sky_background(w, h):
+def sky_gradient(w, h):
+    """Sky gradient as an HxWx3 float32 array (row colors fade from light blue at top to darker at bottom)"""
+    ratio = np.arange(h) / h
+    rows = np.stack([135 + ratio * 20, 206 + ratio * 10, 235 + ratio * 15], 1).astype(np.int32)  # int() per row
+    return np.broadcast_to(rows[:, None, :].astype(np.float32), (h, w, 3))
+
+def create_sky_background(w, h, rng=np.random):
     """Create a more realistic sky background with gradient and clouds"""
-    # Create sky gradient
-    sky = Image.new("RGB", (w, h), (135, 206, 235))  # Sky blue
-    draw = ImageDraw.Draw(sky)
-    
-    # Add gradient effect
-    for y in range(h):
-        ratio = y / h
-        # Fade from light blue at top to darker at bottom
-        r = int(135 + ratio * 20)
-        g = int(206 + ratio * 10)
-        b = int(235 + ratio * 15)
-        draw.line([(0, y), (w, y)], fill=(r, g, b))
-    
     # Add some cloud-like noise
-    arr = np.array(sky).astype(np.float32)
-    noise = np.random.normal(0, 8, size=(h, w, 3))
-    arr = np.clip(arr + noise, 0, 255).astype(np.uint8)
-    
+    noise = rng.normal(0, 8, size=(h, w, 3))
+    arr = np.clip(sky_gradient(w, h) + noise, 0, 255).astype(np.uint8)
     return Image.fromarray(arr)
 
 def draw_realistic_balloon(draw, shape, cx, cy, r, color_variants):
@@ -88,6 +87,52 @@ def draw_realistic_balloon(draw, shape, cx, cy, r, color_variants):
         ys = [p1[1],p2[1],p3[1]]
         return [min(xs),min(ys),max(xs),max(ys)]
 
+class RenderCache:
+    """Background bank + balloon sprite atlas. Picklable; the arrays are (re)built lazily per process."""
+    def __init__(self, bank_size=64, bank_path=None, seed=0):
+        self.bank_size = bank_size; self.bank_path = bank_path; self.seed = seed
+        self._banks = {}; self._atlas = {}
+
+    def __getstate__(self):
+        return dict(self.__dict__, _banks={}, _atlas={})
+
+    def bank(self, w, h):
+        key = (w, h)
+        if key not in self._banks:
+            def fill(out):
+                for k in range(self.bank_size):
+                    out[k] = np.asarray(create_sky_background(w, h, np.random.RandomState(self.seed * 100003 + k)))
+            if self.bank_path:
+                # one .npy per frame size; workers map it read-only and share the page cache
+                path = f"{os.path.splitext(self.bank_path)[0]}_{w}x{h}_{self.bank_size}.npy"
+                if not os.path.exists(path):
+                    tmp = f"{path}.{os.getpid()}.tmp"
+                    mm = np.lib.format.open_memmap(tmp, "w+", np.uint8, (self.bank_size, h, w, 3))
+                    fill(mm); mm.flush(); del mm
+                    os.replace(tmp, path)
+                self._banks[key] = np.load(path, mmap_mode="r")
+            else:
+                arr = np.empty((self.bank_size, h, w, 3), np.uint8); fill(arr)
+                self._banks[key] = arr
+        return self._banks[key]
+
+    def background(self, w, h):
+        return Image.fromarray(np.array(self.bank(w, h)[random.randrange(self.bank_size)]))
+
+    def sprite(self, shape, color, r):
+        key = (shape, color, r)
+        if key not in self._atlas:
+            rgb, mask, c, rel = render_sprite(lambda draw, c: draw_realistic_balloon(draw, shape, c, c, r, [color]), r)
+            self._atlas[key] = (Image.fromarray(rgb), Image.fromarray(mask.astype(np.uint8) * 255), c, rel)
+        return self._atlas[key]
+
+    def draw_balloon(self, im, shape, cx, cy, r, color_variants):
+        """Same pixels and bbox as draw_realistic_balloon, pasted from the atlas."""
+        color = random.choice(color_variants)
+        spr, mask, c, rel = self.sprite(shape, color, r)
+        im.paste(spr, (cx - c, cy - c), mask)
+        return [rel[0] + cx, rel[1] + cy, rel[2] + cx, rel[3] + cy]
+
 def apply_motion_blur(image, intensity=0.3):
     """Apply motion blur to simulate movement"""
     if random.random() < intensity:
@@ -118,10 +163,10 @@ def bbox_to_yolo(bbox, W, H):
     w = (x2-x1); h = (y2-y1)
     return x/W, y/H, w/W, h/H
 
-def gen_enhanced_image(out_images, out_labels, idx, W=640, H=360, n_shapes=(1,5)):
-    """Generate enhanced synthetic image with better realism"""
+def gen_enhanced_image(out_images, out_labels, idx, W=640, H=360, n_shapes=(1,5), cache=None):
+    """Generate enhanced synthetic image with better realism (cache: RenderCache or None)"""
     # Create realistic background
-    im = create_sky_background(W, H)
+    im = cache.background(W, H) if cache else create_sky_background(W, H)
     draw = ImageDraw.Draw(im)
     
     n = random.randint(*n_shapes)
@@ -159,7 +204,8 @@ def gen_enhanced_image(out_images, out_labels, idx, W=640, H=360, n_shapes=(1,5)
                 break
         
         objects.append((cx, cy, r))
-        bbox = draw_realistic_balloon(draw, shape, cx, cy, r, color_variants)
+        if cache: bbox = cache.draw_balloon(im, shape, cx, cy, r, color_variants)
+        else: bbox = draw_realistic_balloon(draw, shape, cx, cy, r, color_variants)
         cxn, cyn, wn, hn = bbox_to_yolo(bbox, W, H)
         ann_lines.append(f"0 {cxn:.6f} {cyn:.6f} {wn:.6f} {hn:.6f}")
         meta["shapes"].append({
@@ -187,6 +233,22 @@ def gen_enhanced_image(out_images, out_labels, idx, W=640, H=360, n_shapes=(1,5)
     
     return img_path, lbl_path, meta
 
+def bench(n, W, H, cache):
+    """images/sec (render + save) without and with the render cache; atlas/bank warm-up excluded."""
+    tmp = tempfile.mkdtemp(prefix="synth_bench_")
+    try:
+        for name, c in (("no cache", None), ("cache", cache)):
+            random.seed(0); np.random.seed(0)
+            if c:
+                for i in range(n): gen_enhanced_image(tmp, tmp, i, W, H, cache=c)  # warm the atlas
+                random.seed(0); np.random.seed(0)
+            t = time.perf_counter()
+            for i in range(n): gen_enhanced_image(tmp, tmp, i, W, H, cache=c)
+            dt = time.perf_counter() - t
+            print(f"{name:>8s}: {n/dt:7.1f} img/s  ({dt*1000/n:.2f} ms/img, {W}x{H})")
+    finally:
+        shutil.rmtree(tmp)
+
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--out", default="data/enhanced_synth_samples", help="output root")
@@ -194,30 +256,20 @@ def main():
     ap.add_argument("--val", type=int, default=60)
     ap.add_argument("--W", type=int, default=640)
     ap.add_argument("--H", type=int, default=360)
+    ap.add_argument("--bank", type=int, default=64, help="pre-rendered backgrounds (0 = render every image)")
+    ap.add_argument("--bank_path", default="", help="memory-mapped background bank file (.npy), shared by workers")
+    ap.add_argument("--bench", type=int, default=0, help="only benchmark N images with/without the cache")
+    add_args(ap)
     args = ap.parse_args()
 
-    train_img = os.path.join(args.out,"train/images"); os.makedirs(train_img, exist_ok=True)
-    train_lbl = os.path.join(args.out,"train/labels"); os.makedirs(train_lbl, exist_ok=True)
-    val_img = os.path.join(args.out,"val/images"); os.makedirs(val_img, exist_ok=True)
-    val_lbl = os.path.join(args.out,"val/labels"); os.makedirs(val_lbl, exist_ok=True)
-
-    metas = {"train":[], "val":[]}
-    
-    print("Generating enhanced training data...")
-    for i in range(args.train):
-        if i % 50 == 0:
-            print(f"  Progress: {i}/{args.train}")
-        img,lbl,meta = gen_enhanced_image(train_img,train_lbl,i,args.W,args.H)
-        metas["train"].append({"img":img,"label":lbl,**meta})
-    
-    print("Generating enhanced validation data...")
-    for i in range(args.val):
-        img,lbl,meta = gen_enhanced_image(val_img,val_lbl,i,args.W,args.H)
-        metas["val"].append({"img":img,"label":lbl,**meta})
-    
-    with open(os.path.join(args.out,"meta.json"),"w") as f:
-        json.dump(metas,f,indent=2)
-    
+    cache = RenderCache(args.bank, args.bank_path or None, args.seed) if args.bank else None
+    if args.bench:
+        bench(args.bench, args.W, args.H, cache or RenderCache(seed=args.seed)); return
+    if cache: cache.bank(args.W, args.H)  # build once, before the pool: forked workers share it
+    print("Generating enhanced data...")
+    gen = partial(gen_enhanced_image, cache=cache) if cache else gen_enhanced_image
+    generate(gen, args.out, {"train": args.train, "val": args.val}, args.W, args.H,
+             workers=args.workers, seed=args.seed, fresh=args.fresh)
     print(f"Enhanced dataset complete! Train={args.train}, Val={args.val} → {args.out}")
 
 if __name__ == "__main__":
@@ -0,0 +1,168 @@
+#!/usr/bin/env python3
+"""
+Binary event log with a background writer.
+- Two tables per session: semantic events (<stem>.evl: birth/death/hit/veto/fire ...) and
+  high-rate per-frame track samples (<stem>_tracks.evl), the latter sampled every N frames.
+- Records are NumPy structured arrays (fixed-size, typed; no float formatting) written into
+  preallocated buffers on the loop thread; full buffers are handed to a writer thread.
+- File = 8-byte magic + uint32 header length + JSON header (dtype, enum vocabularies) + raw
+  records, so read_evl() can np.memmap it and a truncated tail record is simply ignored.
+- The writer flushes after every buffer, so a crash loses at most the last flush_s of events;
+  callers should still close() in a finally block to drain the rest.
+
+  python scripts/event_log.py logs/events.evl --csv logs/events.csv   # export for old tools
+"""
+import argparse, json, os, queue, struct, threading, time
+import numpy as np
+
+MAGIC = b"BAPEVL1\0"
+EVENTS = ("track", "birth", "death", "hit", "veto", "fire")
+TYPES = ("", "small", "big")
+LABELS = ("", "enemy", "friend")
+CORRECT = {None: -1, False: 0, True: 1, "false": 0, "true": 1}
+
+EVENT_DTYPE = np.dtype([("t", "<f8"), ("frame", "<u4"), ("event", "u1"), ("id", "<i4"),
+                        ("x1", "<i2"), ("y1", "<i2"), ("x2", "<i2"), ("y2", "<i2"),
+                        ("type", "u1"), ("label", "u1"), ("correct", "i1")])
+TRACK_DTYPE = np.dtype([("t", "<f8"), ("frame", "<u4"), ("id", "<i4"),
+                        ("x1", "<i2"), ("y1", "<i2"), ("x2", "<i2"), ("y2", "<i2")])
+
+def _header(dtype, table):
+    h = json.dumps(dict(table=table, dtype=dtype.descr, events=EVENTS, types=TYPES, labels=LABELS)).encode()
+    h += b" " * (-(len(MAGIC) + 4 + len(h)) % 16)  # keep records 16-byte aligned
+    return MAGIC + struct.pack("<I", len(h)) + h
+
+class _Table:
+    """Preallocated record buffers for one file; the loop fills, the writer thread drains."""
+    def __init__(self, path, dtype, table, capacity, jobs):
+        self.dtype = dtype; self.capacity = capacity; self.jobs = jobs
+        self.f = open(path, "wb"); self.f.write(_header(dtype, table)); self.f.flush()
+        self.free = queue.Queue()
+        for _ in range(3): self.free.put(np.empty(capacity, dtype))
+        self.buf = self.free.get(); self.n = 0
+        self.written = 0; self.grown = 0
+
+    def reserve(self, k):
+        """Return a k-record slice of the active buffer (swapping it out first if needed)."""
+        if self.n + k > self.capacity: self.swap()
+        if k > self.capacity:
+            return np.empty(k, self.dtype), True  # oversized batch: written straight away
+        out = self.buf[self.n:self.n + k]; self.n += k
+        return out, False
+
+    def swap(self):
+        if not self.n: return
+        self.jobs.put((self, self.buf, self.n))
+        try: self.buf = self.free.get_nowait()
+        except queue.Empty:
+            self.buf = np.empty(self.capacity, self.dtype); self.grown += 1  # writer behind: never block the loop
+        self.n = 0
+
+class EventLog:
+    def __init__(self, path, sample_every=1, capacity=4096, flush_s=0.5):
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        stem = os.path.splitext(path)[0]
+        self.path = stem + ".evl"; self.tracks_path = stem + "_tracks.evl"
+        self.sample_every = max(1, sample_every); self.flush_s = flush_s
+        self._jobs = queue.Queue()
+        self.events = _Table(self.path, EVENT_DTYPE, "events", capacity // 8 or 1, self._jobs)
+        self.samples = _Table(self.tracks_path, TRACK_DTYPE, "tracks", capacity, self._jobs)
+        self._prev_ids = np.zeros(0, np.int64); self._prev_boxes = np.zeros((0, 4))
+        self._last_flush = time.monotonic()
+        self._thread = threading.Thread(target=self._run, name="event-log", daemon=True)
+        self._thread.start()
+
+    def _run(self):
+        while True:
+            job = self._jobs.get()
+            if job is None: return
+            table, buf, n = job
+            table.f.write(memoryview(buf[:n]).cast("B")); table.f.flush(); table.written += n
+            if buf.shape[0] == table.capacity: table.free.put(buf)
+
+    def _tick(self):
+        now = time.monotonic()
+        if now - self._last_flush > self.flush_s:
+            self.events.swap(); self.samples.swap(); self._last_flush = now
+
+    def event(self, event, t, frame=0, id=-1, box=(0, 0, 0, 0), type="", label="", correct=None):
+        """One semantic event (hit / veto / fire / ...); type/label/correct as in score_harness."""
+        rec, direct = self.events.reserve(1)
+        r = rec[0]
+        r["t"] = t; r["frame"] = frame; r["event"] = EVENTS.index(event); r["id"] = id
+        r["x1"], r["y1"], r["x2"], r["y2"] = np.clip(np.round(box), -32768, 32767)
+        r["type"] = TYPES.index(type or ""); r["label"] = LABELS.index(label or ""); r["correct"] = CORRECT[correct]
+        if direct: self._jobs.put((self.events, rec, 1))
+        self._tick()
+
+    def tracks(self, t, frame, ids, boxes):
+        """Per-frame track state: emits birth/death events from id changes and, every
+        sample_every frames, one sample per track (a single vectorized copy)."""
+        ids = np.asarray(ids, np.int64); boxes = np.asarray(boxes, float).reshape(-1, 4)
+        born = ~np.isin(ids, self._prev_ids); died = ~np.isin(self._prev_ids, ids)
+        for i, b in zip(ids[born], boxes[born]): self.event("birth", t, frame, int(i), b.astype(int))
+        for i, b in zip(self._prev_ids[died], self._prev_boxes[died]): self.event("death", t, frame, int(i), b.astype(int))
+        self._prev_ids, self._prev_boxes = ids, boxes
+        if frame % self.sample_every == 0 and len(ids):
+            rec, direct = self.samples.reserve(len(ids))
+            rec["t"] = t; rec["frame"] = frame; rec["id"] = ids
+            b = np.clip(np.round(boxes), -32768, 32767).astype(np.int16)
+            rec["x1"], rec["y1"], rec["x2"], rec["y2"] = b.T
+            if direct: self._jobs.put((self.samples, rec, len(ids)))
+        self._tick()
+
+    def close(self):
+        self.events.swap(); self.samples.swap()
+        self._jobs.put(None); self._thread.join()
+        for tb in (self.events, self.samples): tb.f.close()
+
+def read_evl(path):
+    """Memory-map an .evl file → structured array (a torn last record is dropped)."""
+    with open(path, "rb") as f:
+        head = f.read(len(MAGIC) + 4)
+        if not head: raise ValueError(f"{path}: empty event log (writer stopped before the header was written)")
+        if head[:len(MAGIC)] != MAGIC: raise ValueError(f"{path}: not an event log")
+        if len(head) < len(MAGIC) + 4: raise ValueError(f"{path}: truncated event log header")
+        hlen, = struct.unpack("<I", head[len(MAGIC):])
+        try: header = json.loads(f.read(hlen))
+        except ValueError: raise ValueError(f"{path}: truncated event log header") from None
+    dtype = np.dtype([tuple(d) for d in header["dtype"]])
+    offset = len(MAGIC) + 4 + hlen
+    n = (os.path.getsize(path) - offset) // dtype.itemsize
+    if n <= 0: return np.zeros(0, dtype)
+    return np.memmap(path, dtype, "r", offset, (n,))
+
+def is_evl(path):
+    # by name, so an empty or headerless .evl is reported by read_evl instead of parsed as CSV
+    if path.endswith(".evl"): return True
+    with open(path, "rb") as f: return f.read(len(MAGIC)) == MAGIC
+
+def export_csv(path, out):
+    """Old CSV layout (t,event,id,x1,y1,x2,y2,type,label,correct) from both tables, time-ordered."""
+    import csv
+    ev = read_evl(path); stem = os.path.splitext(path)[0]
+    tr = read_evl(stem + "_tracks.evl") if os.path.exists(stem + "_tracks.evl") else np.zeros(0, TRACK_DTYPE)
+    # unset type/label/correct are written as score_harness's defaults so scores don't change
+    rows = [(float(e["t"]), EVENTS[e["event"]], int(e["id"]), int(e["x1"]), int(e["y1"]), int(e["x2"]), int(e["y2"]),
+             TYPES[e["type"]] or "small", LABELS[e["label"]] or "enemy", "false" if e["correct"] == 0 else "true")
+            for e in ev]
+    rows += [(float(s["t"]), "track", int(s["id"]), int(s["x1"]), int(s["y1"]), int(s["x2"]), int(s["y2"]), "", "", "")
+             for s in tr]
+    rows.sort(key=lambda r: r[0])
+    with open(out, "w", newline="") as f:
+        w = csv.writer(f); w.writerow(["t","event","id","x1","y1","x2","y2","type","label","correct"])
+        w.writerows([f"{r[0]:.3f}", *r[1:]] for r in rows)
+    return len(rows)
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("log", help="<stem>.evl")
+    ap.add_argument("--csv", default="", help="export both tables to this CSV")
+    args = ap.parse_args()
+    ev = read_evl(args.log)
+    counts = {EVENTS[k]: int(v) for k, v in zip(*np.unique(ev["event"], return_counts=True))}
+    print(f"{args.log}: {len(ev)} events {counts}")
+    if args.csv: print(f"{export_csv(args.log, args.csv)} rows → {args.csv}")
+
+if __name__ == "__main__":
+    main()
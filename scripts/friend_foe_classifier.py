@@ -1,20 +1,26 @@
 #!/usr/bin/env python3
 """
 Friend/Foe color classifier.
-- Maps HSV histogram/mean color to a discrete label.
-- Conservative gate: "unknown" → do not fire.
+- Maps HSV histogram/mean color to a discrete label (hue averaged on the circle, so reds
+  either side of 0/180 stay red).
+- Batch path: the frame's per-pixel color labels (color_segment.ColorLUT.labels) are turned
+  into one integral image per color once, then every box's color fractions are four lookups
+  (classify_boxes), however many boxes there are.
+- Conservative gate: "unknown" or low confidence → do not fire.
+
+  python scripts/friend_foe_classifier.py --bench 50 100 200   # batch vs per-ROI throughput
 """
+import argparse, time
 import numpy as np, cv2
+from color_segment import LABELS, get_lut
 
 # Define which color is friend vs foe for Stage-2 (you can swap as needed)
 FRIEND_COLOR = "green"
 FOE_COLOR = "red"
+MIN_CONF = 0.6      # is_fire_allowed: below this a foe color is still "do not fire"
+MIN_COVERAGE = 0.3  # colored share of a box that counts as fully covered (a triangle fills ~0.5)
 
-def classify_color_name(bgr_roi):
-    hsv = cv2.cvtColor(bgr_roi, cv2.COLOR_BGR2HSV)
-    mean = hsv.mean(axis=(0,1))  # H,S,V means
-    H = mean[0]
-
+def hue_label(H):
     # Simple H-based decision; you can refine with S/V thresholds
     if (H < 15) or (H > 170):  # red-ish (wraps around)
         return "red"
@@ -24,7 +30,85 @@ def classify_color_name(bgr_roi):
         return "blue"
     return "unknown"
 
-def is_fire_allowed(color_label):
-    # Fire only if explicitly considered FOE
-    return color_label == FOE_COLOR
+def mean_hue(hsv):
+    # circular mean (OpenCV hue is 0..180 = 0..360 deg): red 2 and red 178 average to 0, not 90
+    a = hsv[..., 0].astype(np.float32) * (np.pi / 90)
+    return float(np.arctan2(np.sin(a).mean(), np.cos(a).mean()) * (90 / np.pi)) % 180
+
+def classify_color_name(bgr_roi):
+    return hue_label(mean_hue(cv2.cvtColor(bgr_roi, cv2.COLOR_BGR2HSV)))
+
+def color_integrals(labels):
+    """(H+1)x(W+1)xK integral images of each color's 0/255 mask (K = len(LABELS)-1, "none" left out)."""
+    onehot = cv2.merge([cv2.compare(labels, k, cv2.CMP_EQ) for k in range(1, len(LABELS))])
+    depth = cv2.CV_32S if labels.size * 255 < 2**31 else cv2.CV_64F
+    return cv2.integral(onehot, sdepth=depth).reshape(labels.shape[0] + 1, labels.shape[1] + 1, -1)
+
+def classify_boxes(integ, boxes):
+    """Per box (Nx4 xyxy, clipped to the frame): color fractions (NxK over LABELS[1:]), label and confidence.
+    confidence = purity (top color / colored pixels) scaled down while coverage < MIN_COVERAGE."""
+    b = np.asarray(boxes, dtype=np.float64).reshape(-1, 4)
+    if not len(b): return np.zeros((0, integ.shape[2])), [], np.zeros(0)
+    H, W = integ.shape[0] - 1, integ.shape[1] - 1
+    x1, x2 = (np.clip(np.round(b[:, i]), 0, W).astype(np.intp) for i in (0, 2))
+    y1, y2 = (np.clip(np.round(b[:, i]), 0, H).astype(np.intp) for i in (1, 3))
+    x2 = np.maximum(x2, x1); y2 = np.maximum(y2, y1)
+    counts = (integ[y2, x2] - integ[y1, x2] - integ[y2, x1] + integ[y1, x1]).astype(np.float64)
+    area = np.maximum((x2 - x1) * (y2 - y1), 1)[:, None]
+    frac = counts / (255 * area)
+    colored = frac.sum(1)
+    top = frac.argmax(1)
+    purity = frac[np.arange(len(b)), top] / np.maximum(colored, 1e-9)
+    conf = purity * np.minimum(colored / MIN_COVERAGE, 1.0)
+    names = [LABELS[t + 1] if c > 0 else "unknown" for t, c in zip(top, colored)]
+    return frac, names, conf
+
+def classify_frame(frame, boxes, labels=None):
+    """Convenience: labels (computed with the shared LUT if not given) → classify_boxes."""
+    if labels is None: labels = get_lut().labels(frame)
+    return classify_boxes(color_integrals(labels), boxes)
+
+def is_fire_allowed(color_label, confidence, min_conf=MIN_CONF):
+    # Fire only if explicitly considered FOE, and sure enough about it
+    return color_label == FOE_COLOR and confidence >= min_conf
+
+def _scene(W, H, n, seed=0):
+    # n non-overlapping-ish balloons on a gray sky, reds straddling the hue wrap
+    rng = np.random.default_rng(seed)
+    frame = np.full((H, W, 3), (170, 160, 150), np.uint8)
+    bgr = {"red": [(20, 20, 220), (60, 10, 200)], "green": [(40, 180, 40)], "blue": [(200, 80, 30)]}
+    boxes, truth = [], []
+    for _ in range(n):
+        c = str(rng.choice(list(bgr))); col = bgr[c][rng.integers(len(bgr[c]))]
+        r = int(rng.integers(10, 30)); x, y = int(rng.integers(r, W - r)), int(rng.integers(r, H - r))
+        cv2.circle(frame, (x, y), r, col, -1)
+        boxes.append([x - r, y - r, x + r + 1, y + r + 1]); truth.append(c)
+    return frame, np.array(boxes, float), truth
+
+def main():
+    ap = argparse.ArgumentParser(description="Batch (integral image) vs per-ROI friend/foe classification")
+    ap.add_argument("--bench", type=int, nargs="+", default=[50, 100, 200], help="ROIs per frame")
+    ap.add_argument("--res", default="1280x720")
+    ap.add_argument("--iters", type=int, default=50)
+    args = ap.parse_args()
+    W, H = map(int, args.res.split("x"))
+    lut = get_lut()
+    for n in args.bench:
+        frame, boxes, truth = _scene(W, H, n)
+        bi = boxes.astype(int)
+        per_roi = lambda: [classify_color_name(frame[y1:y2, x1:x2]) for x1, y1, x2, y2 in bi]
+        labels = lut.labels(frame)  # the detector computes this anyway
+        batch = lambda: classify_boxes(color_integrals(labels), boxes)
+        res = {}
+        for name, fn in (("per-ROI HSV", per_roi), ("integral", batch)):
+            fn(); t = time.perf_counter()
+            for _ in range(args.iters): out = fn()
+            res[name] = ((time.perf_counter() - t) * 1000 / args.iters, out)
+        names, conf = res["integral"][1][1], res["integral"][1][2]
+        acc = lambda got: np.mean([g == c for g, c in zip(got, truth)]) * 100
+        print(f"{n:4d} ROIs @ {W}x{H}: per-ROI {res['per-ROI HSV'][0]:.2f} ms ({acc(res['per-ROI HSV'][1]):.0f}% correct)  "
+              f"integral {res['integral'][0]:.2f} ms ({acc(names):.0f}% correct, mean conf {conf.mean():.2f})  "
+              f"{res['per-ROI HSV'][0] / res['integral'][0]:.1f}x")
 
+if __name__ == "__main__":
+    main()
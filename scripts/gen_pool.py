@@ -0,0 +1,95 @@
+#!/usr/bin/env python3
+"""
+Parallel, resumable driver for the synthetic dataset generators.
+- Every image index gets its own seed derived from (--seed, split, index) and both `random`
+  and `np.random` are reseeded before rendering it, so the dataset is identical whatever the
+  worker count or completion order.
+- Images are rendered in a process pool (imap_unordered, chunked; the generator is installed
+  once per worker by the pool initializer, jobs carry only indices); metadata is streamed to
+  <out>/meta.jsonl one line per finished image ({"split", "idx", "img", "label", ...}).
+- Re-running resumes: indices already listed in meta.jsonl are skipped (--fresh starts over);
+  a torn last line left by a crash is cut off first.
+"""
+import os, json, random, time
+import multiprocessing as mp
+import numpy as np
+
+SPLITS = ("train", "val")
+
+def index_seed(seed, split, idx):
+    return int(np.random.SeedSequence([seed, SPLITS.index(split), idx]).generate_state(1)[0])
+
+_GEN = None  # the generator, installed once per worker process (not pickled into every job)
+
+def _init(gen):
+    global _GEN
+    _GEN = gen
+
+def _render(job):
+    img_dir, lbl_dir, split, idx, W, H, seed = job
+    s = index_seed(seed, split, idx)
+    random.seed(s); np.random.seed(s)
+    img, lbl, meta = _GEN(img_dir, lbl_dir, idx, W, H)
+    return {"split": split, "idx": idx, "img": img, "label": lbl, **meta}
+
+def load_done(meta_path):
+    """(split, idx) pairs already recorded in meta.jsonl; a torn last line is ignored."""
+    done = set()
+    if not os.path.exists(meta_path): return done
+    with open(meta_path) as f:
+        for line in f:
+            try: m = json.loads(line)
+            except ValueError: continue
+            done.add((m["split"], m["idx"]))
+    return done
+
+def trim_torn_tail(meta_path):
+    """Cut meta.jsonl back to its last newline, so appending after a crash mid-write doesn't
+    glue the next record onto the torn line."""
+    if not os.path.exists(meta_path): return
+    with open(meta_path, "rb+") as f:
+        end = pos = f.seek(0, os.SEEK_END)
+        while pos > 0:
+            step = min(4096, pos); f.seek(pos - step)
+            i = f.read(step).rfind(b"\n")
+            if i >= 0: pos += i + 1 - step; break
+            pos -= step
+        if pos != end: f.truncate(pos)
+
+def generate(gen, out, counts, W=640, H=360, workers=1, seed=0, fresh=False, chunksize=8):
+    """Render counts={"train": n, "val": m} with gen(img_dir, lbl_dir, idx, W, H) into out/."""
+    meta_path = os.path.join(out, "meta.jsonl")
+    os.makedirs(out, exist_ok=True)
+    if fresh and os.path.exists(meta_path): os.remove(meta_path)
+    trim_torn_tail(meta_path)
+    done = load_done(meta_path)
+    jobs = []
+    for split, n in counts.items():
+        img_dir = os.path.join(out, split, "images"); os.makedirs(img_dir, exist_ok=True)
+        lbl_dir = os.path.join(out, split, "labels"); os.makedirs(lbl_dir, exist_ok=True)
+        jobs += [(img_dir, lbl_dir, split, i, W, H, seed) for i in range(n) if (split, i) not in done]
+    total = sum(counts.values())
+    if len(done): print(f"Resuming: {total - len(jobs)}/{total} already done")
+    workers = workers or os.cpu_count() or 1
+    # gen (e.g. a RenderCache partial) goes to each worker once; with fork it isn't pickled at all,
+    # so whatever the parent built before the pool (background bank, atlas) is shared copy-on-write
+    _init(gen)
+    pool = mp.get_context().Pool(workers, _init, (gen,)) if workers > 1 and len(jobs) > 1 else None
+    it = pool.imap_unordered(_render, jobs, chunksize) if pool else map(_render, jobs)
+    t0 = time.perf_counter(); k = 0
+    try:
+        with open(meta_path, "a", buffering=1) as f:  # line-buffered: a crash loses at most one line
+            for m in it:
+                f.write(json.dumps(m) + "\n"); k += 1
+                if k % 500 == 0:
+                    print(f"  {k}/{len(jobs)}  {k / (time.perf_counter() - t0):.1f} img/s")
+    finally:
+        if pool: pool.terminate(); pool.join()
+    dt = time.perf_counter() - t0
+    print(f"Rendered {k} images in {dt:.1f} s ({k / max(dt, 1e-9):.1f} img/s, {workers} worker(s)) → {meta_path}")
+    return k
+
+def add_args(ap):
+    ap.add_argument("--workers", type=int, default=1, help="processes (0 = all cores)")
+    ap.add_argument("--seed", type=int, default=0, help="base seed; per-image seeds derive from it")
+    ap.add_argument("--fresh", action="store_true", help="ignore meta.jsonl and regenerate everything")
@@ -0,0 +1,128 @@
+#!/usr/bin/env python3
+"""
+Lightweight per-stage latency instrumentation.
+- Named spans (capture, masking, morphology, contours, classify, inference, tracking,
+  decision, drawing, logging, ...) timed with perf_counter_ns.
+- Fixed-size ring buffer per span → rolling p50/p95/p99 computed only when asked.
+- Export summary to CSV or JSON (by file extension) and an optional on-frame HUD.
+- PROF is the shared instance; it is disabled (no-op spans) until an entry point enables it,
+  so library code can always write `with PROF.span("masking"): ...`.
+"""
+import json, os, time
+from time import perf_counter_ns
+import numpy as np
+
+class _Rec:
+    __slots__ = ("buf", "n", "window")
+    def __init__(self, window):
+        self.buf = [0] * window; self.n = 0; self.window = window
+    def add(self, ns):
+        self.buf[self.n % self.window] = ns; self.n += 1
+    def samples(self):
+        return np.asarray(self.buf[:min(self.n, self.window)], dtype=np.float64) / 1e6  # ms
+    def recent(self, k):
+        k = min(k, self.n, self.window)
+        return np.asarray([self.buf[i % self.window] for i in range(self.n - k, self.n)], dtype=np.float64) / 1e6
+
+class _Span:
+    __slots__ = ("rec", "t")
+    def __init__(self, rec): self.rec = rec; self.t = 0
+    def __enter__(self): self.t = perf_counter_ns(); return self
+    def __exit__(self, *exc): self.rec.add(perf_counter_ns() - self.t)
+
+class _NullSpan:
+    __slots__ = ()
+    def __enter__(self): return self
+    def __exit__(self, *exc): pass
+
+_NULL = _NullSpan()
+
+class Profiler:
+    def __init__(self, enabled=False, window=1000):
+        self.window = window
+        self.recs = {}; self._spans = {}
+        self._last_frame = None
+        self._hud = []; self._hud_t = 0.0
+        self._span_cost_ns = 0.0
+        self.enabled = False
+        if enabled: self.enable()
+
+    def enable(self, window=None):
+        if window: self.window = window
+        self.enabled = True
+        # calibrate the cost of one span so overhead can be reported
+        s = self.span("_calib"); t = perf_counter_ns()
+        for _ in range(2000):
+            with s: pass
+        self._span_cost_ns = (perf_counter_ns() - t) / 2000
+        del self.recs["_calib"], self._spans["_calib"]
+        return self
+
+    def span(self, name):
+        if not self.enabled: return _NULL
+        s = self._spans.get(name)
+        if s is None:
+            rec = self.recs[name] = _Rec(self.window)
+            s = self._spans[name] = _Span(rec)
+        return s
+
+    def frame(self):
+        """Call once per loop iteration; records the full frame period as span 'frame'."""
+        if not self.enabled: return
+        now = perf_counter_ns()
+        if self._last_frame is not None:
+            self.span("frame").rec.add(now - self._last_frame)
+        self._last_frame = now
+
+    def stats(self):
+        out = {}
+        for name, rec in self.recs.items():
+            x = rec.samples()
+            if not len(x): continue
+            p50, p95, p99 = np.percentile(x, [50, 95, 99])
+            out[name] = dict(n=rec.n, mean_ms=float(x.mean()), p50_ms=float(p50), p95_ms=float(p95),
+                             p99_ms=float(p99), max_ms=float(x.max()))
+        return out
+
+    def overhead_pct(self):
+        # spans recorded per frame x calibrated span cost, relative to the mean frame time
+        fr = self.recs.get("frame")
+        if fr is None or fr.n == 0: return 0.0
+        spans = sum(r.n for k, r in self.recs.items() if k != "frame") / fr.n
+        return 100.0 * spans * self._span_cost_ns / 1e6 / max(fr.samples().mean(), 1e-9)
+
+    def fps(self):
+        fr = self.recs.get("frame")
+        if fr is None or fr.n == 0: return 0.0
+        return 1000.0 / max(fr.recent(30).mean(), 1e-9)
+
+    def dump(self, path):
+        """Write the rolling summary to path (.json or .csv)."""
+        if not self.enabled or not path: return
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        st = self.stats()
+        if path.endswith(".json"):
+            with open(path, "w") as f:
+                json.dump(dict(spans=st, overhead_pct=self.overhead_pct(),
+                               span_cost_ns=self._span_cost_ns, window=self.window), f, indent=2)
+        else:
+            with open(path, "w") as f:
+                f.write("span,n,mean_ms,p50_ms,p95_ms,p99_ms,max_ms\n")
+                for k, v in st.items():
+                    f.write(f"{k},{v['n']}," + ",".join(f"{v[c]:.4f}" for c in
+                            ("mean_ms", "p50_ms", "p95_ms", "p99_ms", "max_ms")) + "\n")
+
+    def draw(self, frame, x=10, y=44, every=0.5):
+        """On-frame HUD: p50/p95/p99 per span; text is refreshed every `every` seconds."""
+        if not self.enabled: return
+        import cv2
+        now = time.monotonic()
+        if now - self._hud_t > every:
+            self._hud_t = now
+            st = self.stats()
+            self._hud = [f"FPS {self.fps():.1f}  prof {self.overhead_pct():.2f}%"] + \
+                        [f"{k:10s} {v['p50_ms']:6.2f} {v['p95_ms']:6.2f} {v['p99_ms']:6.2f}" for k, v in st.items()]
+        for i, line in enumerate(self._hud):
+            cv2.putText(frame, line, (x, y + 16*i), cv2.FONT_HERSHEY_PLAIN, 1.0, (0,255,255), 1, cv2.LINE_AA)
+
+PROF = Profiler()
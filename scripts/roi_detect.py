@@ -0,0 +1,82 @@
+#!/usr/bin/env python3
+"""
+Track-guided ROI detection.
+- Once targets are tracked, most frames only run the detector on padded windows
+  around the tracker's predicted boxes; a full-frame sweep still runs every N
+  frames, when there are no tracks, or when the track count changed.
+- Detections are mapped back to frame coordinates, so callers see the same
+  [x1,y1,x2,y2,(score)] rows as from the plain detector.
+- skipped_frac reports how much frame area was not processed.
+"""
+import numpy as np
+
+def merge_windows(rects):
+    # Merge overlapping [x1,y1,x2,y2] windows until none overlap (no duplicate detections)
+    rects = [list(r) for r in rects]
+    merged = True
+    while merged and len(rects) > 1:
+        merged = False
+        out = []
+        while rects:
+            a = rects.pop()
+            i = 0
+            while i < len(rects):
+                b = rects[i]
+                if a[0] < b[2] and b[0] < a[2] and a[1] < b[3] and b[1] < a[3]:
+                    a = [min(a[0],b[0]), min(a[1],b[1]), max(a[2],b[2]), max(a[3],b[3])]
+                    rects.pop(i); merged = True
+                else:
+                    i += 1
+            out.append(a)
+        rects = out
+    return rects
+
+class TrackGuidedDetector:
+    """Wraps a detector fn(frame) -> rows and a SortLite; call it like the detector."""
+    def __init__(self, detector, tracker, sweep_every=10, pad=0.6, min_pad=24):
+        self.detector = detector
+        self.tracker = tracker
+        self.sweep_every = sweep_every
+        self.pad = pad            # padding as a fraction of the predicted box size
+        self.min_pad = min_pad    # pixels; covers motion the model didn't predict
+        self.frame_idx = 0
+        self._last_count = -1
+        self.last_sweep = True
+        self.last_windows = []
+        self.skipped_frac = 0.0   # area skipped on the last frame
+        self.mean_skipped = 0.0   # running mean over all frames
+
+    def windows(self, shape):
+        H, W = shape[:2]
+        if len(self.tracker) == 0: return []
+        boxes = self.tracker.predicted_boxes(1)
+        wh = np.maximum(boxes[:, 2:] - boxes[:, :2], 1.0)
+        p = np.maximum(self.pad * wh.max(1, keepdims=True), self.min_pad)
+        r = np.concatenate([boxes[:, :2] - p, boxes[:, 2:] + p], 1)
+        r = np.clip(np.round(r), 0, [W, H, W, H]).astype(int)
+        r = r[(r[:, 2] > r[:, 0]) & (r[:, 3] > r[:, 1])]
+        return merge_windows(r.tolist())
+
+    def __call__(self, frame):
+        H, W = frame.shape[:2]
+        n = len(self.tracker)
+        sweep = (self.frame_idx % self.sweep_every == 0) or n == 0 or n != self._last_count
+        self.frame_idx += 1
+        self._last_count = n
+        wins = [] if sweep else self.windows(frame.shape)
+        if sweep or not wins:
+            self.last_sweep, self.last_windows, self.skipped_frac = True, [[0, 0, W, H]], 0.0
+            dets = self.detector(frame)
+        else:
+            dets = []
+            area = 0
+            for x1, y1, x2, y2 in wins:
+                area += (x2 - x1) * (y2 - y1)
+                for d in self.detector(frame[y1:y2, x1:x2]):
+                    d = list(d)
+                    d[0] += x1; d[1] += y1; d[2] += x1; d[3] += y1
+                    dets.append(d)
+            self.last_sweep, self.last_windows = False, wins
+            self.skipped_frac = 1.0 - area / float(W * H)
+        self.mean_skipped += (self.skipped_frac - self.mean_skipped) / self.frame_idx
+        return dets
@@ -0,0 +1,102 @@
+#!/usr/bin/env python3
+"""
+Latency-budgeted hybrid detector: YOLO + HSV/contour fallback as one detector.
+- The cheap CV detector runs every frame; YOLO runs every Nth frame, or earlier
+  when the per-frame budget has room for it, or immediately when tracks weaken
+  (a confirmed track missed a frame or the confirmed count dropped).
+- N adapts to hold the target frame rate (measured call-to-call, so it includes
+  tracking/drawing/logging as well).
+- On YOLO frames, CV boxes that overlap a YOLO box are dropped, the rest are merged.
+- Every decision and its measured cost can be logged to CSV for tuning.
+"""
+import csv, os, time
+import numpy as np
+from sort_tracker import iou_matrix, split_dets
+from instrument import PROF
+
+class HybridScheduler:
+    def __init__(self, yolo, cv, tracker, target_fps=30.0, budget_ms=None, min_every=1,
+                 max_every=15, adjust_every=10, log_path=None):
+        self.yolo = yolo; self.cv = cv; self.tracker = tracker
+        self.target_fps = target_fps
+        self.budget_ms = budget_ms if budget_ms else 1000.0 / target_fps
+        self.min_every = min_every; self.max_every = max_every
+        self.adjust_every = adjust_every
+        self.every = min_every          # N: YOLO period in frames
+        self.since_yolo = 10**9         # frames since the last YOLO run (first frame runs it)
+        self.yolo_ms = 0.0; self.cv_ms = 0.0   # EMA costs of each detector
+        self.other_ms = 0.0             # EMA of the rest of the frame (tracking, drawing, logging)
+        self._det_ms = 0.0
+        self.fps = 0.0
+        self.frame_ms = 0.0             # EMA of the call-to-call period
+        self.frame_idx = 0
+        self._last_call = None
+        self._last_confirmed = 0
+        self._weak_seen = False         # YOLO already re-run for the current weak episode
+        self.last = None                # (decision, reason) of the last frame
+        self._logf = None
+        if log_path:
+            os.makedirs(os.path.dirname(log_path) or ".", exist_ok=True)
+            self._logf = open(log_path, "w", newline=""); self._log = csv.writer(self._logf)
+            self._log.writerow(["frame","t","decision","reason","every","yolo_ms","cv_ms","frame_ms","fps"])
+
+    def _tracks_weak(self):
+        tr = self.tracker
+        n_conf = int(tr.confirmed.sum())
+        dropped = n_conf < self._last_confirmed
+        self._last_confirmed = n_conf
+        missed = bool((tr.confirmed & (tr.ttl < tr.max_age)).any())
+        return dropped or missed
+
+    def _adapt(self):
+        # hold the target rate: run YOLO less often when slow, more often when there is slack
+        if self.frame_idx % self.adjust_every or not self.fps: return
+        if self.fps < self.target_fps * 0.95: self.every = min(self.every + 1, self.max_every)
+        elif self.fps > self.target_fps * 1.10: self.every = max(self.every - 1, self.min_every)
+
+    def decide(self):
+        weak = self._tracks_weak()
+        retry = weak and not self._weak_seen  # re-run YOLO once per episode, not every frame
+        self._weak_seen = weak
+        if self.since_yolo >= self.every: return "yolo", "period"
+        if retry: return "yolo", "track_drop"
+        if self.yolo_ms + self.cv_ms + self.other_ms <= self.budget_ms: return "yolo", "budget"
+        return "cv", "between"
+
+    @staticmethod
+    def _ema(old, new, a=0.2):
+        return new if not old else (1 - a) * old + a * new
+
+    def __call__(self, frame):
+        now = time.perf_counter()
+        frame_ms = (now - self._last_call) * 1000 if self._last_call else 0.0
+        if frame_ms:
+            self.frame_ms = self._ema(self.frame_ms, frame_ms, 0.1)
+            self.fps = 1000.0 / self.frame_ms
+            self.other_ms = self._ema(self.other_ms, max(frame_ms - self._det_ms, 0.0))
+        self._last_call = now
+        self.frame_idx += 1
+        with PROF.span("decision"):
+            self._adapt()
+            decision, reason = self.decide()
+
+        t = time.perf_counter(); cv_boxes, cv_scores = split_dets(self.cv(frame))
+        self.cv_ms = self._ema(self.cv_ms, (time.perf_counter() - t) * 1000)
+        dets = np.concatenate([cv_boxes, cv_scores[:, None]], 1)
+        if decision == "yolo":
+            t = time.perf_counter(); y_boxes, y_scores = split_dets(self.yolo(frame))
+            self.yolo_ms = self._ema(self.yolo_ms, (time.perf_counter() - t) * 1000)
+            self.since_yolo = 0
+            # keep CV boxes YOLO didn't cover (CV fallback for what the model missed)
+            extra = ~(iou_matrix(cv_boxes, y_boxes) >= 0.5).any(1) if len(y_boxes) else np.ones(len(cv_boxes), bool)
+            dets = np.concatenate([np.concatenate([y_boxes, y_scores[:, None]], 1), dets[extra]], 0)
+        self.since_yolo += 1
+        self._det_ms = (time.perf_counter() - now) * 1000
+        self.last = (decision, reason)
+        if self._logf:
+            self._log.writerow([self.frame_idx, f"{now:.4f}", decision, reason, self.every,
+                                f"{self.yolo_ms:.2f}", f"{self.cv_ms:.2f}", f"{frame_ms:.2f}", f"{self.fps:.1f}"])
+        return dets
+
+    def close(self):
+        if self._logf: self._logf.close(); self._logf = None
@@ -3,71 +3,219 @@
 Score harness that reads an events CSV and computes stage scores & BSP.
 CSV format (per row): t,event,id,x1,y1,x2,y2,extra...
 You can append custom rows like: t, "hit", id, ..., "type=small", "label=enemy"
+Binary logs from event_log.EventLog (<stem>.evl) are read too, via memory mapping.
+Batch mode (--dir logs/) scores every session log for all stages in a process pool with a
+streaming parser and writes reports/score_report.csv (per session + aggregate rows).
 """
-import argparse, csv
+import argparse, csv, os, glob, time
+import multiprocessing as mp
+from event_log import read_evl, is_evl, EVENTS, TYPES, LABELS
+
+# caps and penalties per rules
+RULES = {
+    1: dict(cap=60, big=5, small=15),
+    2: dict(cap=100, big=10, small=20, wrong_pen=-30),
+    3: dict(cap=140, hit=20, wrong_pen=-50),
+}
+FAIL_WRONG = {2: 2, 3: 3}  # wrong hits that zero the base
+
+class LiveScore:
+    """Incremental scorer: O(1) per event, identical to compute_score_stage on the same stream.
+    Feed logged events with add(e), or hit(...) / tick(t) directly from a live loop."""
+    def __init__(self, stage, duration=300.0):
+        if stage not in RULES: raise ValueError("stage must be 1,2,3")
+        self.stage = stage; self.duration = duration
+        self.rules = RULES[stage]
+        self.raw = 0; self.wrong = 0; self.t_last = 0.0
+
+    def tick(self, t):
+        self.t_last = max(self.t_last, float(t))
+
+    def add(self, e):
+        self.tick(e.get("t","0"))
+        if e["event"] == "hit":
+            self.hit(e.get("type","small"), e.get("label","enemy"), e.get("correct","true"))
+
+    def hit(self, type="small", label="enemy", correct="true"):
+        # log hits with type=small/big and label=friend/enemy (stages 1-2), correct=true/false (stage 3)
+        r = self.rules
+        if self.stage in (1,2):
+            if self.stage==2 and label == "friend":
+                self.raw += r["wrong_pen"]  # friend hit penalty
+                self.wrong += 1
+                return
+            self.raw += r["small"] if type=="small" else r["big"]
+        elif correct in ("true", True):
+            self.raw += r["hit"]
+        else:
+            self.raw += r["wrong_pen"]
+            self.wrong += 1
+
+    @property
+    def failed(self):
+        return self.wrong >= FAIL_WRONG.get(self.stage, float("inf"))
+
+    @property
+    def base(self):
+        # failure conditions, then cap
+        return 0 if self.failed else max(0, min(self.raw, self.rules["cap"]))
+
+    @property
+    def bsp(self):
+        # BSP (remaining time is last event's t subtracted from duration; or full duration if no events)
+        remaining = max(0.0, self.duration - self.t_last)
+        return 20.0 * (remaining / self.duration)
+
+    def result(self):
+        base, bsp = self.base, self.bsp
+        return dict(base=base, bsp=bsp, total=base + bsp, wrong=self.wrong)
 
 def compute_score_stage(stage, events, duration=300.0):
-    base = 0; wrong = 0
-    # caps and penalties per rules
-    if stage == 1:
-        cap=60; big=5; small=15
-    elif stage == 2:
-        cap=100; big=10; small=20; wrong_pen=-30
-    elif stage == 3:
-        cap=140; hit=20; wrong_pen=-50
-    else:
-        raise ValueError("stage must be 1,2,3")
-
-    # Read hits (you must log hits with 'event'=='hit' and include 'type=small/big' and 'label=friend/enemy')
-    for e in events:
-        if e["event"] != "hit": continue
-        if stage in (1,2):
-            typ = e.get("type","small")
-            if stage==2:
-                lab = e.get("label","enemy")
-                if lab == "friend":
-                    base += wrong_pen  # friend hit penalty
-                    wrong += 1
-                    continue
-            base += small if typ=="small" else big
-        else: # stage 3
-            if e.get("correct","true") == "true":
-                base += hit
-            else:
-                base += wrong_pen
-                wrong += 1
-
-    # Failure conditions
-    if stage==2 and wrong>=2: base=0
-    if stage==3 and wrong>=3: base=0
-
-    # cap
-    base = max(0, min(base, cap))
-
-    # BSP (remaining time is last event's t subtracted from duration; or full duration if no events)
-    t_last = max([float(e.get("t","0")) for e in events]+[0.0])
-    remaining = max(0.0, duration - t_last)
-    bsp = 20.0 * (remaining / duration)
-
-    total = base + bsp
-    return dict(base=base, bsp=bsp, total=total, wrong=wrong)
+    score = LiveScore(stage, duration)
+    for e in events: score.add(e)
+    return score.result()
+
+def read_evl_events(path):
+    # Semantic events as CSV-like dicts (unset type/label/correct left out, as in a CSV without them);
+    # the per-frame samples only matter through their last t (BSP)
+    rows=[]
+    for e in read_evl(path):
+        row = dict(t=float(e["t"]), event=EVENTS[e["event"]], id=int(e["id"]))
+        if e["type"]: row["type"] = TYPES[e["type"]]
+        if e["label"]: row["label"] = LABELS[e["label"]]
+        if e["correct"] >= 0: row["correct"] = "true" if e["correct"] else "false"
+        rows.append(row)
+    tracks = os.path.splitext(path)[0] + "_tracks.evl"
+    if os.path.exists(tracks):
+        tr = read_evl(tracks)
+        if len(tr): rows.append(dict(t=float(tr["t"][-1]), event="track", id=int(tr["id"][-1])))
+    return rows
+
+def _extras(row, extra):
+    # trailing key=value columns beyond the header (e.g. "type=small","label=enemy")
+    for x in extra:
+        k, sep, v = x.partition("=")
+        if sep: row[k] = v
 
 def read_log(path):
-    # Accepts CSV with header, plus optional extra columns "type", "label", "correct", "t"
+    # Accepts CSV with header, plus optional extra columns "type", "label", "correct", "t"; or an .evl log
+    if is_evl(path): return read_evl_events(path)
     rows=[]
     with open(path, newline="") as f:
-        r=csv.DictReader(f)
+        r=csv.DictReader(f, restkey="_extra")
         for row in r:
+            _extras(row, row.pop("_extra", ()))
             rows.append(row)
     return rows
 
+def score_csv(path, duration=300.0):
+    """All three stages in one streaming pass (no dict per row; only hit rows are materialized).
+    Same result as compute_score_stage(stage, read_log(path)); memory does not grow with rows."""
+    scores = [LiveScore(st, duration) for st in (1,2,3)]
+    rows = hits = 0; t_last = 0.0
+    with open(path, newline="") as f:
+        rd = csv.reader(f)
+        header = next(rd, [])
+        col = {k: i for i, k in enumerate(header)}
+        ti, ei, nh = col.get("t"), col["event"], len(header)
+        opt = [(k, col[k]) for k in ("type","label","correct") if k in col]
+        for row in rd:
+            if not row: continue
+            rows += 1
+            if ti is not None:
+                t = float(row[ti])
+                if t > t_last: t_last = t
+            if row[ei] != "hit": continue
+            hits += 1
+            e = {"event": "hit"}
+            for k, i in opt:
+                if i < len(row): e[k] = row[i]
+            if len(row) > nh: _extras(e, row[nh:])
+            for sc in scores: sc.add(e)
+    for sc in scores: sc.tick(t_last)
+    return rows, hits, scores
+
+def score_session(job):
+    path, duration = job
+    t = time.perf_counter()
+    try:
+        if is_evl(path):
+            ev = read_evl_events(path)
+            scores = [LiveScore(st, duration) for st in (1,2,3)]
+            for e in ev:
+                for sc in scores: sc.add(e)
+            rows, hits = len(ev), sum(e["event"] == "hit" for e in ev)
+        else:
+            rows, hits, scores = score_csv(path, duration)
+    except Exception as ex:
+        return dict(session=path, error=f"{type(ex).__name__}: {ex}")
+    out = dict(session=path, rows=rows, hits=hits, t_last=scores[0].t_last, parse_s=time.perf_counter()-t)
+    for sc in scores:
+        r = sc.result()
+        out.update({f"A{sc.stage}_{k}": v for k, v in r.items()}, **{f"A{sc.stage}_failed": int(sc.failed)})
+    return out
+
+def find_logs(root, pattern="events*"):
+    evl = [p for p in glob.glob(os.path.join(root, "**", pattern + ".evl"), recursive=True)
+           if not p.endswith("_tracks.evl")]
+    # a CSV exported next to its .evl (event_log --csv) is the same session: keep the .evl
+    stems = {os.path.splitext(p)[0] for p in evl}
+    csvs = [p for p in glob.glob(os.path.join(root, "**", pattern + ".csv"), recursive=True)
+            if os.path.splitext(p)[0] not in stems]
+    return sorted(csvs + evl)
+
+def batch_report(root, out, duration=300.0, workers=0, pattern="events*"):
+    paths = find_logs(root, pattern)
+    if not paths: print(f"No logs matching {pattern}.csv/.evl under {root}"); return []
+    jobs = sorted(((p, duration) for p in paths), key=lambda j: -os.path.getsize(j[0]))  # big files first
+    workers = min(workers or os.cpu_count() or 1, len(jobs))
+    t = time.perf_counter()
+    if workers > 1:
+        with mp.get_context().Pool(workers) as pool: res = pool.map(score_session, jobs, chunksize=1)
+    else:
+        res = [score_session(j) for j in jobs]
+    res.sort(key=lambda r: r["session"])
+    ok = [r for r in res if "error" not in r]
+    cols = ["session","rows","hits","t_last"] + [f"A{s}_{k}" for s in (1,2,3)
+            for k in ("base","bsp","total","wrong","failed")] + ["error"]
+    agg = []
+    if ok:
+        for name, fn in (("ALL:mean", lambda x: sum(x)/len(x)), ("ALL:min", min), ("ALL:max", max)):
+            agg.append(dict(session=name, **{c: fn([r[c] for r in ok]) for c in cols[1:-1]}))
+        agg.append(dict(session="ALL:sum", rows=sum(r["rows"] for r in ok), hits=sum(r["hits"] for r in ok),
+                        **{f"A{s}_failed": sum(r[f"A{s}_failed"] for r in ok) for s in (1,2,3)}))
+    os.makedirs(os.path.dirname(out) or ".", exist_ok=True)
+    with open(out, "w", newline="") as f:
+        w = csv.DictWriter(f, cols, extrasaction="ignore"); w.writeheader()
+        for r in res + agg:
+            w.writerow({k: f"{v:.3f}" if isinstance(v, float) else v for k, v in r.items()})
+    dt = time.perf_counter() - t
+    n_rows = sum(r["rows"] for r in ok)
+    print(f"{len(ok)}/{len(res)} sessions, {n_rows} rows in {dt:.1f} s ({n_rows/max(dt,1e-9)/1e6:.2f} M rows/s, "
+          f"{workers} worker(s)) → {out}")
+    for s in (1,2,3):
+        tot = [r[f"A{s}_total"] for r in ok]
+        if tot: print(f"  A{s}: mean total {sum(tot)/len(tot):.1f}  min {min(tot):.1f}  max {max(tot):.1f}  "
+                      f"failed {sum(r[f'A{s}_failed'] for r in ok)}")
+    for r in res:
+        if "error" in r: print(f"  ERROR {r['session']}: {r['error']}")
+    return res
+
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--stage", type=int, required=True)
-    ap.add_argument("--log", required=True)
+    ap.add_argument("--stage", type=int, choices=[1,2,3])
+    ap.add_argument("--log", help="one session log (.csv or .evl)")
+    ap.add_argument("--dir", help="batch: score every events*.csv/.evl under this directory, all stages")
+    ap.add_argument("--pattern", default="events*", help="batch: log file name pattern (without extension)")
+    ap.add_argument("--out", default="reports/score_report.csv", help="batch report path")
+    ap.add_argument("--workers", type=int, default=0, help="batch: processes (0 = all cores)")
     ap.add_argument("--end", type=float, default=300.0, help="stage duration seconds")
     args = ap.parse_args()
 
+    if args.dir:
+        batch_report(args.dir, args.out, args.end, args.workers, args.pattern); return
+    if not (args.stage and args.log): ap.error("--stage and --log are required without --dir")
+
     events = read_log(args.log)
     res = compute_score_stage(args.stage, events, duration=args.end)
     print(f"Stage {args.stage} Score → Base={res['base']:.1f}  BSP={res['bsp']:.1f}  Total={res['total']:.1f}  Wrong={res['wrong']}")
@@ -1,34 +1,76 @@
 #!/usr/bin/env python3
 """
 Double-check logic for Stage-3: shape + color must both match.
-- Uses simple contour-based shape classification + mean color.
+- Consumes the detector's blob_features.Blob records: contour-based shape (classify_shape)
+  + color label, each computed once per blob; mean_color_label (circular hue mean) for raw ROIs.
+- roi_color_shape() is the per-track classifier for SortLite.classify(); run this file to
+  compare classifying every track every frame with the tracker's cached votes.
 """
+import argparse, time
 import cv2, numpy as np
-
-def classify_shape(contour):
-    peri = cv2.arcLength(contour, True)
-    approx = cv2.approxPolyDP(contour, 0.03 * peri, True)
-    area = cv2.contourArea(contour)
-    if peri == 0: return "unknown"
-    circularity = 4*np.pi*(area/(peri*peri))
-    if len(approx) >= 8 or circularity > 0.7:
-        return "circle"
-    elif len(approx) == 3:
-        return "triangle"
-    elif 4 <= len(approx) <= 6:
-        return "square"
-    return "unknown"
+from friend_foe_classifier import hue_label, mean_hue
+from blob_features import blobs_from_mask, classify_shape
+from color_segment import get_lut
 
 def mean_color_label(roi_bgr):
-    hsv = cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)
-    H = hsv[...,0].mean()
-    if (H < 15) or (H > 170): return "red"
-    if 40 <= H <= 85: return "green"
-    if 95 <= H <= 130: return "blue"
-    return "unknown"
+    # circular hue mean (see friend_foe_classifier); with many boxes per frame use classify_boxes
+    return hue_label(mean_hue(cv2.cvtColor(roi_bgr, cv2.COLOR_BGR2HSV)))
 
-def shape_color_match(contour, roi_bgr, target_shape, target_color):
-    s = classify_shape(contour)
-    c = mean_color_label(roi_bgr)
+def shape_color_match(blob, target_shape, target_color):
+    # blob: blob_features.Blob from the detector; its shape/color are computed once and cached
+    s, c = blob.shape, blob.color
     ok = (s == target_shape) and (c == target_color)
     return ok, s, c
+
+def roi_color_shape(roi_bgr):
+    """(color, shape) of the largest colored blob in a track ROI; color from that blob's pixels only."""
+    if not roi_bgr.size: return "unknown", "unknown"
+    colors = get_lut().labels(roi_bgr)
+    blobs = blobs_from_mask(get_lut().mask_from_labels(colors), colors=colors)
+    if not blobs: return "unknown", "unknown"
+    b = max(blobs, key=lambda b: b.area)
+    return b.color, b.shape
+
+def main():
+    ap = argparse.ArgumentParser(description="Per-frame vs cached (SortLite votes) track classification")
+    ap.add_argument("--source", default="synth://1280x720?n=50&traj=sine")
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--flicker", type=float, default=0.35, help="per-frame brightness jitter (lighting changes)")
+    args = ap.parse_args()
+    from synth_source import SynthSource
+    from sort_tracker import SortLite, iou_matrix, assign
+    from track_demo import detect_cv
+    res = {}
+    for mode in ("every frame", "cached"):
+        src = SynthSource.from_url(args.source); rng = np.random.default_rng(0)
+        tr = SortLite(iou_thresh=0.3, max_age=30)
+        calls = ms = flips = rc = rs = n = 0; last = {}
+        for _ in range(args.frames):
+            ok, frame, gt, gid = src.read_gt()
+            if not ok: break
+            frame = cv2.convertScaleAbs(frame, alpha=1.0 + rng.uniform(-args.flicker, args.flicker))
+            out = tr.update(detect_cv(frame))
+            t = time.perf_counter()
+            if mode == "cached":
+                calls += tr.classify(frame, roi_color_shape); labels = tr.class_labels()
+            else:
+                idx = np.nonzero(tr.confirmed)[0]; boxes = tr.boxes[idx].astype(int)
+                labels = {int(tr.ids[i]): roi_color_shape(frame[max(y1,0):y2, max(x1,0):x2])[::-1]
+                          for i, (x1, y1, x2, y2) in zip(idx, boxes)}  # (shape, color): color at [1]
+                labels = {k: (c, 1.0, s, 1.0) for k, (s, c) in labels.items()}; calls += len(idx)
+            ms += (time.perf_counter() - t) * 1000
+            for tid, lab in labels.items():
+                if tid in last and last[tid] != lab[::2]: flips += 1
+                last[tid] = lab[::2]
+            tb = np.array([b for _, b, _ in out]).reshape(-1, 4); ids = [i for i, _, _ in out]
+            gi, ti = assign(iou_matrix(gt, tb), 0.5)
+            for g, k in zip(gi, ti):
+                c, _, s, _ = labels[ids[k]]
+                rc += c == src.colors[gid[g]]; rs += s == src.shapes[gid[g]]; n += 1
+        res[mode] = ms
+        print(f"{mode:>11s}: {calls / args.frames:6.1f} classifier calls/frame  {ms / args.frames:6.2f} ms/frame  "
+              f"label flips {flips}  correct: color {rc / max(n, 1) * 100:.1f}% shape {rs / max(n, 1) * 100:.1f}%")
+    print(f"classification cost: {res['every frame'] / max(res['cached'], 1e-9):.1f}x lower with the cache")
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,172 @@
+#!/usr/bin/env python3
+"""
+In-memory synthetic video source: balloons moving over a static background, no disk I/O.
+- Usable wherever a cv2.VideoCapture is (read/isOpened/get/set/release); open_capture maps
+  --source synth://WxH?n=100&traj=linear&style=simple&fps=30&frames=0&seed=0 to it.
+- Each target is drawn once with the dataset generators (synthetic_generator.draw_shape or
+  enhanced_synthetic_generator.draw_realistic_balloon) into a sprite + mask; frames are the
+  cached background with the sprites pasted at their current positions.
+- Trajectories are closed-form in the frame index (linear bounce, sine, circle), so ground
+  truth for any frame is exact: read_gt() → (ok, frame, Nx4 boxes, ids).
+- realtime=1 paces read() to fps (behaves like a camera: CaptureSource drops stale frames).
+
+  python scripts/synth_source.py --source "synth://1920x1080?n=100" --frames 300
+"""
+import argparse, random, time
+from urllib.parse import urlparse, parse_qs
+import cv2, numpy as np
+
+TRAJECTORIES = ("linear", "sine", "circle")
+
+def _reflect(x, lo, hi):
+    # position of a point moving freely inside [lo, hi] with elastic bounces
+    span = np.maximum(hi - lo, 1e-6)
+    x = np.mod(x - lo, 2 * span)
+    return lo + np.where(x > span, 2 * span - x, x)
+
+class SynthSource:
+    def __init__(self, W=1280, H=720, n=10, traj="linear", style="simple", fps=30.0, frames=0,
+                 seed=0, speed=4.0, rmin=None, rmax=None, realtime=False):
+        if traj not in TRAJECTORIES: raise ValueError(f"traj must be one of {TRAJECTORIES}")
+        self.W, self.H, self.n = W, H, n
+        self.traj = traj; self.fps = fps; self.frames = frames
+        self.realtime = realtime; self.live = realtime  # CaptureSource: drop stale frames
+        self.pos_frame = 0; self._opened = True; self._t0 = None
+        rng = np.random.default_rng(seed); self.seed = seed
+        s = H / 720.0
+        rmin = int(rmin or 12 * s); rmax = int(rmax or 40 * s)
+        self.r = rng.integers(rmin, max(rmax, rmin) + 1, n)
+        self.shapes = rng.choice(["circle", "square", "triangle"], n)
+        self.colors = rng.choice(["red", "blue", "green"], n)
+        self.p0 = np.stack([rng.uniform(self.r, W - self.r), rng.uniform(self.r, H - self.r)], 1)
+        ang = rng.uniform(0, 2 * np.pi, n)
+        self.vel = speed * max(W / 1280, 0.5) * rng.uniform(0.5, 1.5, (n, 1)) * np.stack([np.cos(ang), np.sin(ang)], 1)
+        self.phase = rng.uniform(0, 2 * np.pi, n); self.omega = rng.uniform(0.02, 0.08, n)
+        self.amp = rng.uniform(0.5, 2.0, n) * self.r
+        self.bg = self._background(style)
+        self.sprites = [self._sprite(style, i) for i in range(n)]
+
+    @classmethod
+    def from_url(cls, url):
+        """synth://WxH?n=..&traj=..&style=..&fps=..&frames=..&seed=..&speed=..&realtime=0|1"""
+        u = urlparse(url)
+        kw = {k: v[-1] for k, v in parse_qs(u.query).items()}
+        size = (u.netloc or u.path.strip("/")) or "1280x720"
+        W, H = map(int, size.split("x"))
+        conv = dict(n=int, fps=float, frames=int, seed=int, speed=float, rmin=int, rmax=int,
+                    realtime=lambda v: v not in ("0", "false", ""))
+        return cls(W, H, **{k: conv.get(k, str)(v) for k, v in kw.items()})
+
+    def _background(self, style):
+        if style == "enhanced":
+            from enhanced_synthetic_generator import create_sky_background
+            im = create_sky_background(self.W, self.H, np.random.RandomState(self.seed))
+        else:
+            from synthetic_generator import rand_bg
+            im = rand_bg(self.W, self.H, np.random.RandomState(self.seed))
+        return np.ascontiguousarray(np.asarray(im)[:, :, ::-1])
+
+    def _sprite(self, style, i):
+        from synthetic_generator import render_sprite
+        r = int(self.r[i])
+        if style == "enhanced":
+            from enhanced_synthetic_generator import COLORS, draw_realistic_balloon
+            variant = random.Random(i).choice(COLORS[self.colors[i]])  # private RNG: callers' streams untouched
+            draw = lambda d, c: draw_realistic_balloon(d, self.shapes[i], c, c, r, [variant])
+        else:
+            from synthetic_generator import COLORS, draw_shape
+            draw = lambda d, c: draw_shape(d, self.shapes[i], c, c, r, COLORS[self.colors[i]])
+        rgb, mask, _, rel = render_sprite(draw, r)
+        return np.ascontiguousarray(rgb[:, :, ::-1]), mask.astype(np.uint8), np.array(rel, float)  # box relative to center
+
+    def centers(self, k):
+        """Target centers (Nx2) at frame k."""
+        lo = self.r[:, None] * np.ones((1, 2)); hi = np.array([self.W, self.H]) - lo
+        if self.traj == "circle":
+            rad = np.minimum(self.amp * 4, np.min(np.minimum(self.p0 - lo, hi - self.p0), 1))[:, None]
+            a = self.phase + self.omega * k
+            return self.p0 + rad * np.stack([np.cos(a), np.sin(a)], 1)
+        p = self.p0 + self.vel * k
+        if self.traj == "sine":
+            # sinusoidal sway perpendicular to the heading
+            d = self.vel / np.maximum(np.linalg.norm(self.vel, axis=1, keepdims=True), 1e-6)
+            p = p + (self.amp * np.sin(self.phase + self.omega * k))[:, None] * np.stack([-d[:, 1], d[:, 0]], 1)
+        return _reflect(p, lo, hi)
+
+    def gt(self, k=None):
+        """(Nx4 xyxy boxes clipped to the frame, ids) at frame k (default: last returned frame)."""
+        k = self.pos_frame - 1 if k is None else k
+        cs = self.centers(max(k, 0))
+        boxes = np.array([s[2] for s in self.sprites]).reshape(-1, 4) + np.tile(np.round(cs), 2)
+        return np.clip(boxes, 0, [self.W, self.H, self.W, self.H]), np.arange(self.n)
+
+    def render(self, k):
+        frame = self.bg.copy()
+        for (spr, mask, _), (cx, cy) in zip(self.sprites, np.round(self.centers(k)).astype(int)):
+            h, w = mask.shape
+            x1, y1 = cx - w // 2, cy - h // 2
+            # clip the sprite at the frame border
+            ax, ay = max(0, -x1), max(0, -y1)
+            bx, by = min(w, self.W - x1), min(h, self.H - y1)
+            if bx <= ax or by <= ay: continue
+            # cv2.copyTo writes through the ROI view; ~25x faster than np.copyto(where=...)
+            cv2.copyTo(spr[ay:by, ax:bx], mask[ay:by, ax:bx], frame[y1+ay:y1+by, x1+ax:x1+bx])
+        return frame
+
+    def read(self):
+        if not self._opened or (self.frames and self.pos_frame >= self.frames): return False, None
+        if self.realtime:
+            if self._t0 is None: self._t0 = time.monotonic() - self.pos_frame / self.fps
+            wait = self._t0 + self.pos_frame / self.fps - time.monotonic()
+            if wait > 0: time.sleep(wait)
+        frame = self.render(self.pos_frame)
+        self.pos_frame += 1
+        return True, frame
+
+    def read_gt(self):
+        ok, frame = self.read()
+        if not ok: return False, None, np.zeros((0, 4)), np.zeros(0, int)
+        return (True, frame) + self.gt()
+
+    def isOpened(self):
+        return self._opened
+
+    def get(self, prop):
+        return {cv2.CAP_PROP_FRAME_WIDTH: self.W, cv2.CAP_PROP_FRAME_HEIGHT: self.H, cv2.CAP_PROP_FPS: self.fps,
+                cv2.CAP_PROP_FRAME_COUNT: self.frames, cv2.CAP_PROP_POS_FRAMES: self.pos_frame}.get(prop, 0.0)
+
+    def set(self, prop, value):
+        if prop == cv2.CAP_PROP_POS_FRAMES:
+            self.pos_frame = int(value); self._t0 = None; return True
+        return False
+
+    def release(self):
+        self._opened = False
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", default="synth://1920x1080?n=100")
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--show", action="store_true", help="display frames with GT boxes/IDs")
+    args = ap.parse_args()
+
+    src = SynthSource.from_url(args.source)
+    t = time.perf_counter(); k = 0
+    while k < args.frames:
+        ok, frame, boxes, ids = src.read_gt()
+        if not ok: break
+        k += 1
+        if args.show:
+            for (x1, y1, x2, y2), i in zip(boxes.astype(int), ids):
+                cv2.rectangle(frame, (x1, y1), (x2, y2), (0, 255, 255), 1)
+                cv2.putText(frame, str(i), (x1, y1 - 4), cv2.FONT_HERSHEY_PLAIN, 1.0, (0, 255, 255), 1)
+            cv2.imshow("synth", frame)
+            if cv2.waitKey(1) & 0xFF == 27: break
+    dt = time.perf_counter() - t
+    print(f"{src.W}x{src.H}, {src.n} targets: {k} frames in {dt:.2f} s = {k/dt:.1f} FPS "
+          f"({k/dt/src.fps:.1f}x real time at {src.fps:g} FPS)")
+    src.release()
+    if args.show: cv2.destroyAllWindows()
+
+if __name__ == "__main__":
+    main()
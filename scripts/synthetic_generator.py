@@ -3,12 +3,15 @@
 Synthetic dataset generator for balloon targets with color & shape.
 - Produces simple scenes with random backgrounds, multiple balloons (circle/square/triangle),
   and exports YOLO-format labels for a single class "balloon".
-- Shapes & colors are stored in an accompanying metadata JSON for downstream logic tests.
+- Shapes & colors are streamed to <out>/meta.jsonl (one line per image) for downstream logic tests.
+- --workers N renders in a process pool; per-image seeding keeps output identical and
+  re-running resumes from meta.jsonl (gen_pool).
 - This is for DEMO/training bootstrap; you can later mix with real frames.
 """
-import os, json, argparse, random, math
+import os, argparse, random
 from PIL import Image, ImageDraw, ImageFilter, ImageOps
 import numpy as np
+from gen_pool import generate, add_args
 
 COLORS = {
     "red": (220,50,50),
@@ -18,11 +21,11 @@ COLORS = {
 
 SHAPES = ["circle","square","triangle"]
 
-def rand_bg(w,h):
+def rand_bg(w,h,rng=np.random):
     # Soft gradient/noise background
     base = Image.new("RGB",(w,h),(240,240,240))
     arr = np.array(base).astype(np.int16)
-    noise = np.random.normal(0, 6, size=(h,w,3))
+    noise = rng.normal(0, 6, size=(h,w,3))
     arr = np.clip(arr + noise, 0, 255).astype(np.uint8)
     return Image.fromarray(arr)
 
@@ -44,6 +47,21 @@ def draw_shape(draw, shape, cx, cy, r, color):
         ys = [p1[1],p2[1],p3[1]]
         return [min(xs),min(ys),max(xs),max(ys)]
 
+def render_sprite(draw_fn, r):
+    """A target drawn once into a sprite + paste mask, for pasting instead of redrawing.
+    draw_fn(draw, c) draws it centered at (c, c) and returns its bbox. It is drawn on a black and
+    on a white canvas with the same `random` draws; pixels that agree were drawn. The caller's
+    `random` state is left as it was. → (RGB array, bool mask, c, bbox relative to (c, c))"""
+    size = 2 * r + 8; c = size // 2
+    state = random.getstate(); out = []
+    for bg in ((0, 0, 0), (255, 255, 255)):
+        random.setstate(state)
+        im = Image.new("RGB", (size, size), bg)
+        bbox = draw_fn(ImageDraw.Draw(im), c)
+        out.append(np.asarray(im))
+    random.setstate(state)
+    return out[0], (out[0] == out[1]).all(-1), c, [v - c for v in bbox]
+
 def bbox_to_yolo(bbox, W, H):
     # bbox in pixel [x1,y1,x2,y2] -> YOLO [cls cx cy w h] normalized
     x1,y1,x2,y2 = bbox
@@ -87,22 +105,11 @@ def main():
     ap.add_argument("--val", type=int, default=60)
     ap.add_argument("--W", type=int, default=640)
     ap.add_argument("--H", type=int, default=360)
+    add_args(ap)
     args = ap.parse_args()
 
-    train_img = os.path.join(args.out,"train/images"); os.makedirs(train_img, exist_ok=True)
-    train_lbl = os.path.join(args.out,"train/labels"); os.makedirs(train_lbl, exist_ok=True)
-    val_img = os.path.join(args.out,"val/images"); os.makedirs(val_img, exist_ok=True)
-    val_lbl = os.path.join(args.out,"val/labels"); os.makedirs(val_lbl, exist_ok=True)
-
-    metas = {"train":[], "val":[]}
-    for i in range(args.train):
-        img,lbl,meta = gen_image(train_img,train_lbl,i,args.W,args.H)
-        metas["train"].append({"img":img,"label":lbl,**meta})
-    for i in range(args.val):
-        img,lbl,meta = gen_image(val_img,val_lbl,i,args.W,args.H)
-        metas["val"].append({"img":img,"label":lbl,**meta})
-    with open(os.path.join(args.out,"meta.json"),"w") as f:
-        json.dump(metas,f,indent=2)
+    generate(gen_image, args.out, {"train": args.train, "val": args.val}, args.W, args.H,
+             workers=args.workers, seed=args.seed, fresh=args.fresh)
     print(f"Done. Train={args.train}, Val={args.val} → {args.out}")
 
 if __name__ == "__main__":
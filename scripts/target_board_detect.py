@@ -4,18 +4,183 @@ Target board detector placeholder:
 - For demo purposes, we search for a red triangle region (template-like)
   and assume "A/B/C" platform cue is given externally via UI selection or OCR.
 - In real runs, use AprilTag/ArUco or a printed template and a strict ROI.
+- BoardTracker: detect once (red triangle-like blob, or multi-scale match of
+  assets/target_board_template.png), then follow the board by normalized cross-correlation
+  of the locked-on patch in a small window around the last ROI, on a pyrDown'd grayscale crop.
+  Full detection runs again only when the match score drops below min_score.
+- Run this file to time full detection vs tracking on a generated Stage-3 clip.
 """
+import argparse, os, time
 import cv2, numpy as np
+from color_segment import get_lut
 
-def find_board_roi(frame):
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    mask = cv2.inRange(hsv, (0,80,80), (10,255,255))
-    mask2 = cv2.inRange(hsv, (170,80,80), (180,255,255))
-    mask = cv2.bitwise_or(mask, mask2)
+# Board red is a little more permissive on saturation than the balloon ranges
+BOARD_RED_RANGES = {
+    "red1": ((0, 80, 80), (10, 255, 255)),
+    "red2": ((170, 80, 80), (180, 255, 255)),
+}
+TEMPLATE = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets", "target_board_template.png")
+
+def _board_contours(frame):
+    mask = get_lut(BOARD_RED_RANGES).mask(frame)
     mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3,3),np.uint8),1)
     cnts,_ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
+    return [c for c in cnts if cv2.contourArea(c) >= 500]
+
+def find_board_roi(frame):
+    cnts = _board_contours(frame)
     if not cnts: return None
     c = max(cnts, key=cv2.contourArea)
-    if cv2.contourArea(c) < 500: return None
     x,y,w,h = cv2.boundingRect(c)
     return (x,y,w,h)
+
+def find_board_triangle(frame):
+    """(x, y, w, h), score of the largest red blob that fills its box like a triangle (~0.5);
+    score 1 at fill 0.5, 0.43 for a circle (0.785), 0 for a square, so red balloons don't lock."""
+    best = (None, 0.0)
+    for c in sorted(_board_contours(frame), key=cv2.contourArea, reverse=True):
+        x,y,w,h = cv2.boundingRect(c)
+        score = max(0.0, 1.0 - abs(cv2.contourArea(c) / (w*h) - 0.5) / 0.5)
+        if score > best[1]: best = ((x,y,w,h), score)
+        if score >= 0.8: break
+    return best
+
+def load_template(path=TEMPLATE):
+    # grayscale template cropped to its non-white content
+    t = cv2.imread(path, cv2.IMREAD_GRAYSCALE)
+    if t is None: raise FileNotFoundError(path)
+    x, y, w, h = cv2.boundingRect(cv2.compare(t, 250, cv2.CMP_LT))
+    return t[y:y+h, x:x+w]
+
+def find_board_template(frame, template, widths=np.geomspace(0.1, 0.6, 10), work=320, min_score=0.5):
+    """(x, y, w, h), score of the best multi-scale match of template, searched at `work` px width.
+    widths: board widths tried, as fractions of the frame width (the board is large; tiny
+    scales would match any flat patch)."""
+    H, W = frame.shape[:2]; f = work / W
+    g = cv2.resize(cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY), (work, int(round(H * f))), interpolation=cv2.INTER_AREA)
+    best = (None, -1.0)
+    for fw in widths:
+        tw = int(round(fw * work)); th = int(round(tw * template.shape[0] / template.shape[1]))
+        if tw < 8 or th < 8 or tw > g.shape[1] or th > g.shape[0]: continue
+        r = cv2.matchTemplate(g, cv2.resize(template, (tw, th), interpolation=cv2.INTER_AREA), cv2.TM_CCOEFF_NORMED)
+        _, score, _, (x, y) = cv2.minMaxLoc(r)
+        if score > best[1]: best = ((x, y, tw, th), score)
+    (roi, score) = best
+    if roi is None or score < min_score: return None, max(score, 0.0)
+    return tuple(int(round(v / f)) for v in roi), score
+
+class BoardTracker:
+    """Detect the board once, then track it with a local correlation search; call update(frame) per frame."""
+    def __init__(self, method="hsv", template=TEMPLATE, track_size=48, pad=0.25, min_score=0.6):
+        self.method = method
+        self.template = load_template(template) if method == "template" else None
+        self.track_size = track_size  # locked-on patch is matched at this longest side (px)
+        self.pad = pad                # search window margin as a fraction of the ROI size
+        self.min_score = min_score    # below this the board is re-detected
+        self.roi = None; self.conf = 0.0
+        self.detections = 0; self.tracked = 0
+        self._patch = None; self._levels = 0; self._scale = 1.0
+
+    def detect(self, frame):
+        self.detections += 1
+        if self.method == "template": roi, score = find_board_template(frame, self.template)
+        else: roi, score = find_board_triangle(frame)
+        if score < self.min_score: roi = None
+        self.roi = roi; self.conf = score if roi is not None else 0.0
+        if roi is not None: self._lock(frame, roi)
+        return self.roi
+
+    def _gray(self, frame, x1, y1, x2, y2):
+        # ROI of the frame → grayscale at the tracking scale (pyrDown: ~5x cheaper than INTER_AREA
+        # with a fractional ratio)
+        g = cv2.cvtColor(frame[y1:y2, x1:x2], cv2.COLOR_BGR2GRAY)
+        for _ in range(self._levels): g = cv2.pyrDown(g)
+        return g
+
+    def _lock(self, frame, roi):
+        x, y, w, h = roi
+        self._levels = max(0, int(np.ceil(np.log2(max(w, h) / self.track_size))))
+        self._scale = 0.5 ** self._levels
+        self._patch = self._gray(frame, x, y, x+w, y+h)
+
+    def track(self, frame):
+        """Local search around the last ROI; returns the match score (ROI updated in place)."""
+        H, W = frame.shape[:2]
+        x, y, w, h = self.roi
+        px, py = max(2, int(w * self.pad)), max(2, int(h * self.pad))
+        x1, y1 = max(0, x - px), max(0, y - py); x2, y2 = min(W, x + w + px), min(H, y + h + py)
+        win = self._gray(frame, x1, y1, x2, y2)
+        ph, pw = self._patch.shape
+        if win.shape[0] < ph or win.shape[1] < pw: return 0.0
+        r = cv2.matchTemplate(win, self._patch, cv2.TM_CCOEFF_NORMED)
+        _, score, _, (mx, my) = cv2.minMaxLoc(r)
+        # sub-pixel peak (parabola through the neighbours), then back to frame pixels
+        dx = dy = 0.0
+        if 0 < mx < r.shape[1] - 1:
+            a, b, c = r[my, mx-1], r[my, mx], r[my, mx+1]; d = a - 2*b + c
+            if d < 0: dx = 0.5 * (a - c) / d
+        if 0 < my < r.shape[0] - 1:
+            a, b, c = r[my-1, mx], r[my, mx], r[my+1, mx]; d = a - 2*b + c
+            if d < 0: dy = 0.5 * (a - c) / d
+        self.roi = (int(round(x1 + (mx + dx) / self._scale)), int(round(y1 + (my + dy) / self._scale)), w, h)
+        return float(score)
+
+    def update(self, frame):
+        """(x, y, w, h) or None, confidence: tracked when locked and the match holds, else re-detected."""
+        if self.roi is not None:
+            self.conf = max(self.track(frame), 0.0); self.tracked += 1
+            if self.conf >= self.min_score: return self.roi, self.conf
+        self.detect(frame)
+        return self.roi, self.conf
+
+def _clip(W=1280, H=720, frames=300, seed=0, occlude=(150, 170)):
+    # Stage-3-like clip: the template board (printed in saturated red) drifting slowly over a sky
+    # with balloons; hidden during `occlude` frames. Yields (frame, GT board box (x, y, w, h) or None).
+    from synth_source import SynthSource
+    src = SynthSource(W, H, n=8, seed=seed)
+    board = cv2.imread(TEMPLATE); gray = cv2.cvtColor(board, cv2.COLOR_BGR2GRAY)
+    board[(gray < 250) & (gray > 100)] = (40, 40, 210)
+    bx, by, bw, bh = cv2.boundingRect(cv2.compare(gray, 250, cv2.CMP_LT))
+    k_s = W / 4 / board.shape[1]
+    board = cv2.resize(board, None, fx=k_s, fy=k_s, interpolation=cv2.INTER_AREA)
+    gt = [int(round(v * k_s)) for v in (bx, by, bw, bh)]
+    for k in range(frames):
+        frame = src.render(k)
+        if occlude[0] <= k < occlude[1]: yield frame, None; continue
+        x = int(W * 0.35 + 40 * np.sin(k * 0.02)); y = int(H * 0.25 + 15 * np.sin(k * 0.013))
+        frame[y:y+board.shape[0], x:x+board.shape[1]] = board
+        yield frame, (x + gt[0], y + gt[1], gt[2], gt[3])
+
+def main():
+    ap = argparse.ArgumentParser(description="Board localization: full detection every frame vs detect-once-then-track")
+    ap.add_argument("--frames", type=int, default=300)
+    ap.add_argument("--res", default="1280x720")
+    ap.add_argument("--method", choices=["hsv", "template"], default="hsv")
+    args = ap.parse_args()
+    W, H = map(int, args.res.split("x"))
+    clip = list(_clip(W, H, args.frames))
+    # the template board's red outline is the HSV cue: compare against the drawn board box
+    def err(roi, gt):
+        if roi is None or gt is None: return None
+        return np.hypot(roi[0] + roi[2] / 2 - gt[0] - gt[2] / 2, roi[1] + roi[3] / 2 - gt[1] - gt[3] / 2)
+    t = time.perf_counter()
+    full = [find_board_roi(f) if args.method == "hsv" else find_board_template(f, load_template())[0] for f, _ in clip]
+    t_full = (time.perf_counter() - t) * 1000 / len(clip)
+    tr = BoardTracker(args.method); out = []; ms = []; locked = []
+    for f, _ in clip:
+        n = tr.detections
+        t = time.perf_counter(); out.append(tr.update(f)); ms.append((time.perf_counter() - t) * 1000)
+        locked.append(tr.detections == n)  # tracked only, no (re-)detection this frame
+    ms = np.array(ms)
+    e_full = [e for e in (err(r, g) for r, (_, g) in zip(full, clip)) if e is not None]
+    e_trk = [e for e in (err(r, g) for (r, _), (_, g) in zip(out, clip)) if e is not None]
+    hidden = [c for (_, c), (_, g) in zip(out, clip) if g is None]
+    print(f"full {args.method} detection: {t_full:.2f} ms/frame  center err {np.mean(e_full):.1f} px")
+    lk = ms[np.array(locked)]
+    print(f"board tracker: mean {ms.mean():.3f} ms/frame; after lock-on mean {lk.mean():.3f} ms  p95 {np.percentile(lk, 95):.3f} ms  "
+          f"center err {np.mean(e_trk):.1f} px  detections {tr.detections}/{len(clip)}  "
+          f"conf visible {np.mean([c for (_, c), (_, g) in zip(out, clip) if g is not None]):.2f} "
+          f"/ hidden {np.mean(hidden) if hidden else float('nan'):.2f}")
+
+if __name__ == "__main__":
+    main()
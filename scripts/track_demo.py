@@ -2,85 +2,195 @@
 """
 Tracking demo that can take detections from:
 - classic CV ("cv") using color/shape pipeline
-- YOLO ("yolo") using ultralytics model
+- YOLO ("yolo") using ultralytics model, or ONNX Runtime when --weights is a .onnx file
+- both ("hybrid"): YOLO every Nth frame / when budget allows / when tracks weaken, CV in between
 
-It overlays track IDs and prints simple event logs.
+It overlays track IDs and logs births/deaths plus sampled per-frame track boxes to a binary
+event log (event_log.EventLog, written off-thread; --sample_every thins the samples).
+--stage N shows the live score (score_harness.LiveScore) for the session so far.
+Several --source values run as one multi-camera loop: the latest frame of every
+source goes through the detector as a single batch, each stream keeps its own
+SortLite, and per-stream FPS/latency are shown and summarized at exit.
+--prof writes per-stage latency percentiles (instrument.PROF) at exit, --hud draws them live.
+--iff labels every track with its color and accumulated confidence (classify_boxes votes, SortLite.class_labels).
 """
-import argparse, time, csv, os
+import argparse, time, os
 import cv2, numpy as np
 from sort_tracker import SortLite
-from friend_foe_classifier import classify_color_name
+from friend_foe_classifier import color_integrals, classify_boxes
+from color_segment import get_lut
+from blob_features import blobs_from_mask
+from capture import CaptureSource
+from roi_detect import TrackGuidedDetector
+from yolo_backend import yolo_predictor, predict_batch
+from scheduler import HybridScheduler
+from instrument import PROF
+from event_log import EventLog
+from score_harness import LiveScore
 
-def detect_cv(frame):
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    # Simple threshold union of red/blue/green
-    ranges = [((0,90,80),(10,255,255)), ((170,90,80),(180,255,255)), ((95,80,60),(130,255,255)), ((40,60,60),(85,255,255))]
-    mask = None
-    for lo,hi in ranges:
-        m = cv2.inRange(hsv, np.array(lo), np.array(hi))
-        mask = m if mask is None else cv2.bitwise_or(mask,m)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3,3),np.uint8),1)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5,5),np.uint8),1)
-    contours,_ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    dets=[]
-    for c in contours:
-        if cv2.contourArea(c) < 150: continue
-        x,y,w,h = cv2.boundingRect(c)
-        dets.append([x,y,x+w,y+h])
-    return dets
+def detect_cv(frame, labels=None):
+    # Simple threshold union of red/blue/green (shared LUT, see color_segment.HSV_RANGES);
+    # labels: the frame's LUT label image if the caller already has it (--iff reuses it)
+    with PROF.span("masking"):
+        if labels is None: labels = get_lut().labels(frame)
+        mask = get_lut().mask_from_labels(labels)
+    with PROF.span("morphology"):
+        mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3,3),np.uint8),1)
+        mask = cv2.morphologyEx(mask, cv2.MORPH_CLOSE, np.ones((5,5),np.uint8),1)
+    with PROF.span("contours"): blobs = blobs_from_mask(mask, 150)  # bbox/area only
+    return [b.xyxy + [1.0] for b in blobs]  # CV has no confidence: treat as high-score
 
-def yolo_predictor(weights, conf=0.25):
-    try:
-        from ultralytics import YOLO
-        model = YOLO(weights)
-    except Exception as e:
-        print("Ultralytics not available. Install ultralytics or use --det cv"); model=None
-    def _pred(frame):
-        if model is None: return []
-        res = model.predict(frame, conf=conf, verbose=False)[0]
-        return res.boxes.xyxy.cpu().numpy().astype(int).tolist()
-    return _pred
+class Stream:
+    """One camera: its capture, tracker, (optional ROI) detector, log and timing stats."""
+    def __init__(self, idx, source, args, pred, log_path):
+        self.idx = idx
+        self.name = "Track Demo" if idx is None else f"Track Demo [{idx}]"
+        self.cap = CaptureSource(source)
+        self.tracker = SortLite(iou_thresh=0.3, max_age=30, motion=args.motion,
+                                high_thresh=args.conf if args.bytetrack else None, low_thresh=args.low_conf)
+        # per-stream detector wrappers; plain detectors are batched across streams instead
+        self.roi = None; self.det = None
+        if args.det == "hybrid":
+            cv = detect_cv
+            if args.roi: cv = self.roi = TrackGuidedDetector(detect_cv, self.tracker, sweep_every=args.sweep_every)
+            stem, ext = os.path.splitext(args.sched_log)
+            self.det = HybridScheduler(pred, cv, self.tracker, target_fps=args.target_fps, budget_ms=args.budget_ms,
+                                       log_path=(args.sched_log if idx is None else f"{stem}_s{idx}{ext}") if args.sched_log else None)
+        elif args.roi:
+            self.det = self.roi = TrackGuidedDetector(pred, self.tracker, sweep_every=args.sweep_every)
+        self.log = EventLog(log_path, sample_every=args.sample_every)
+        self.score = LiveScore(args.stage, args.end) if args.stage else None
+        self.frames = 0; self.fps = 0.0; self.lat = []
+        self._last = time.monotonic()
+
+    def tick(self, t_cap):
+        now = time.monotonic()
+        self.fps = 0.9*self.fps + 0.1/max(now-self._last, 1e-6) if self.frames else 0.0
+        self._last = now; self.frames += 1
+        lat_ms = (now-t_cap)*1000  # glass-to-decision
+        self.lat.append(lat_ms)
+        return lat_ms
+
+    def close(self):
+        self.cap.release(); self.log.close()
+        if hasattr(self.det, "close"): self.det.close()
 
 def main():
     ap = argparse.ArgumentParser()
-    ap.add_argument("--source", default="0")
-    ap.add_argument("--det", choices=["cv","yolo"], default="cv")
+    ap.add_argument("--source", nargs="+", default=["0"], help="one or more webcam indices / video paths")
+    ap.add_argument("--det", choices=["cv","yolo","hybrid"], default="cv")
     ap.add_argument("--weights", default="runs/train/yolo_balloon/weights/best.pt")
-    ap.add_argument("--log", default="logs/events.csv")
+    ap.add_argument("--log", default="logs/events.evl", help="with several sources: events_s<i>.evl per stream")
+    ap.add_argument("--stage", type=int, choices=[1,2,3], default=None, help="show the live stage score")
+    ap.add_argument("--end", type=float, default=300.0, help="stage duration seconds (BSP)")
+    ap.add_argument("--sample_every", type=int, default=1, help="log per-frame track boxes every N frames")
+    ap.add_argument("--motion", choices=["ema","kalman"], default="ema", help="tracker motion model")
+    ap.add_argument("--conf", type=float, default=0.25, help="YOLO confidence (track threshold with --bytetrack)")
+    ap.add_argument("--bytetrack", action="store_true", help="second association pass with low-score boxes")
+    ap.add_argument("--low_conf", type=float, default=0.1, help="lowest score kept for the ByteTrack pass")
+    ap.add_argument("--roi", action="store_true", help="detect only around predicted tracks between full sweeps")
+    ap.add_argument("--sweep_every", type=int, default=10, help="full-frame sweep period with --roi")
+    ap.add_argument("--target_fps", type=float, default=30.0, help="hybrid: frame rate the YOLO period adapts to")
+    ap.add_argument("--budget_ms", type=float, default=None, help="hybrid: per-frame budget (default 1000/target_fps)")
+    ap.add_argument("--sched_log", default="logs/scheduler.csv", help="hybrid: decision/cost log ('' to disable)")
+    ap.add_argument("--prof", default="", help="write per-stage latency percentiles at exit (.json or .csv)")
+    ap.add_argument("--hud", action="store_true", help="draw per-stage p50/p95/p99 on the frame")
+    ap.add_argument("--iff", action="store_true", help="show friend/foe color + confidence per track")
     args = ap.parse_args()
+    if args.prof or args.hud: PROF.enable()
 
-    if args.det=="yolo":
-        pred = yolo_predictor(args.weights)
+    if args.det in ("yolo","hybrid"):
+        # With ByteTrack YOLO must also return the low-score boxes; --conf then gates new tracks
+        pred = yolo_predictor(args.weights, conf=args.low_conf if args.bytetrack else args.conf)
     else:
         pred = detect_cv
 
-    os.makedirs(os.path.dirname(args.log), exist_ok=True)
-    logf = open(args.log,"w", newline=""); writer = csv.writer(logf)
-    writer.writerow(["t","event","id","x1","y1","x2","y2"])
+    multi = len(args.source) > 1
+    stem, ext = os.path.splitext(args.log)
+    streams = [Stream(i if multi else None, src, args, pred, f"{stem}_s{i}{ext}" if multi else args.log)
+               for i, src in enumerate(args.source)]
+    for s in streams:
+        if not s.cap.isOpened():
+            print(f"Cannot open source {args.source[s.idx or 0]}")
+            for x in streams: x.close()
+            return
+    all_streams = list(streams)
 
-    cap = cv2.VideoCapture(0 if args.source=="0" else args.source)
-    if not cap.isOpened(): print("Cannot open source"); return
-
-    tracker = SortLite(iou_thresh=0.3, max_age=30)
     t0=time.time()
-    while True:
-        ok, frame = cap.read()
-        if not ok: break
-        dets = pred(frame)
-        tracks = tracker.update(dets)
-
-        # draw
-        for (tid, box, stable) in tracks:
-            x1,y1,x2,y2 = box.astype(int)
-            cv2.rectangle(frame,(x1,y1),(x2,y2),(255,255,0),2)
-            cv2.putText(frame,f"ID {tid}",(x1,y1-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(255,255,0),1)
-            writer.writerow([f"{time.time()-t0:.3f}","track",tid,x1,y1,x2,y2])
+    try:
+        while streams:
+            # latest frame from every source; finished sources drop out
+            PROF.frame()
+            grabbed = []
+            with PROF.span("capture"):
+                for s in list(streams):
+                    ok, frame, t_cap = s.cap.read_stamped()
+                    if ok: grabbed.append((s, frame, t_cap))
+                    else: s.close(); streams.remove(s)
+            if not grabbed: break
+            frames = [f for _, f, _ in grabbed]
+            # one batched detector call across streams (ROI / hybrid decide per stream instead)
+            # plain CV: label images once per frame, for the detector and the --iff classifier
+            labels = [None] * len(frames)
+            with PROF.span("inference"):
+                if grabbed[0][0].det is not None: all_dets = [s.det(f) for s, f, _ in grabbed]
+                elif pred is detect_cv:
+                    with PROF.span("labels"): labels = [get_lut().labels(f) for f in frames]
+                    all_dets = [detect_cv(f, lab) for f, lab in zip(frames, labels)]
+                else: all_dets = predict_batch(pred, frames)
 
-        cv2.imshow("Track Demo", frame)
-        if cv2.waitKey(1)&0xFF==27: break
+            for (s, frame, t_cap), dets, lab in zip(grabbed, all_dets, labels):
+                with PROF.span("tracking"): tracks = s.tracker.update(dets)
+                lat_ms = s.tick(t_cap)
 
-    cap.release(); cv2.destroyAllWindows()
-    logf.close()
+                with PROF.span("logging"):
+                    t = time.time()-t0
+                    s.log.tracks(t, s.frames, [tid for tid, _, _ in tracks], [box for _, box, _ in tracks])
+                    if s.score: s.score.tick(t)
+                classes = {}
+                if args.iff:
+                    with PROF.span("classify"):
+                        due = s.tracker.classify_due()  # settled tracks keep their accumulated votes
+                        if len(due):
+                            if lab is None: lab = get_lut().labels(frame)  # YOLO / ROI / hybrid detections
+                            _, colors, confs = classify_boxes(color_integrals(lab), s.tracker.boxes[due])
+                            s.tracker.vote(due, colors, weights=confs)
+                        classes = s.tracker.class_labels()
+                with PROF.span("drawing"):
+                    for (tid, box, stable) in tracks:
+                        x1,y1,x2,y2 = box.astype(int)
+                        label = f"ID {tid}"
+                        if tid in classes: label += f" {classes[tid][0]} {classes[tid][1]:.2f}"
+                        cv2.rectangle(frame,(x1,y1),(x2,y2),(255,255,0),2)
+                        cv2.putText(frame,label,(x1,y1-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(255,255,0),1)
+                    hud = f"lat {lat_ms:.0f} ms  drop {s.cap.dropped}"
+                    if multi: hud = f"FPS {s.fps:.1f}  " + hud
+                    if s.roi is not None:
+                        hud += f"  skip {s.roi.skipped_frac*100:.0f}% (avg {s.roi.mean_skipped*100:.0f}%)"
+                        for x1,y1,x2,y2 in s.roi.last_windows:
+                            if not s.roi.last_sweep: cv2.rectangle(frame,(x1,y1),(x2,y2),(80,80,80),1)
+                    if args.det == "hybrid":
+                        hud += f"  {s.det.last[0]} N={s.det.every}"
+                    if s.score:
+                        hud += f"  A{args.stage} {s.score.base:.0f}+{s.score.bsp:.1f}" + ("  FAIL" if s.score.failed else "")
+                    cv2.putText(frame,hud,(10,22),cv2.FONT_HERSHEY_SIMPLEX,0.6,(0,255,255),2,cv2.LINE_AA)
+                    if args.hud: PROF.draw(frame)
+                cv2.imshow(s.name, frame)
+            if cv2.waitKey(1)&0xFF==27: break
+    finally:
+        # also on errors / Ctrl-C: close() drains the event log buffers to disk
+        for s in streams: s.close()
+        cv2.destroyAllWindows()
+    if args.prof:
+        PROF.dump(args.prof)
+        print(f"profile → {args.prof} (instrumentation overhead {PROF.overhead_pct():.2f}%)")
+    if multi:
+        wall = max(time.time()-t0, 1e-6)
+        for s in all_streams:
+            lat = np.array(s.lat or [0.0])
+            print(f"stream {s.idx}: {s.frames} frames  {s.frames/wall:.1f} FPS  "
+                  f"latency mean {lat.mean():.1f} ms  p95 {np.percentile(lat,95):.1f} ms  dropped {s.cap.dropped}")
+        print(f"total: {sum(s.frames for s in all_streams)/wall:.1f} FPS over {len(all_streams)} streams")
 
 if __name__ == "__main__":
     main()
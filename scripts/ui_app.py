@@ -1,66 +1,87 @@
 #!/usr/bin/env python3
 """
-Streamlit UI for the demo:
-- Live webcam feed
-- "Engagement Accepted" button
-- Draw/edit no-fire mask (simple toggle display for now)
-- Live score display (A1/A2/A3)
+Streamlit UI for the demo — a viewer/controller for scripts/vision_service.py:
+- The vision loop (capture, detection, tracking, classification, no-fire gate, score) runs in
+  the vision service process; a Streamlit rerun never touches the camera or the tracker.
+- Live feed: latest annotated JPEG from shared memory, shown as-is (no decode/re-encode here)
+- "Engagement Accepted", stage, Stage-3 target (shape + color), mask overlay and timings are sent over the control slot; all
+  browser sessions share one writer (vision_service.ControlWriter) and send only their changes
+- Live score display (A1/A2/A3), loop FPS/latency and Stage-3 board confidence from the state slot
+- No service running: a button starts one on the webcam (or run it yourself, e.g. on a video)
+- A restarted service is picked up: the shared-memory handles are re-attached when their
+  creating process is gone or the state goes stale, and the session's settings are re-sent
 Note: Streamlit is for demonstration; for low-latency control, a native UI is recommended.
 """
 import streamlit as st
-import cv2, time, numpy as np, os
-from sort_tracker import SortLite
-from friend_foe_classifier import classify_color_name, is_fire_allowed
+import json, os, subprocess, sys, time
+from vision_service import attach, DEFAULT_NAME
+
+UI_FPS = 10  # display refresh; the service publishes at its own --jpeg_fps
+STALE_S = 2.0  # no new state for this long: re-attach (the service may have been restarted)
 
 st.set_page_config(page_title="Air-Defense Demo UI", layout="wide")
 st.title("Air-Defense Demo UI")
 
+@st.cache_resource
+def service(name=DEFAULT_NAME):
+    return attach(name)  # one set per server, shared by all sessions; raises (not cached) while no service runs
+
+def reattach():
+    # the cached handles still map the old service's segments (unlinked, but kept alive by the
+    # mapping): drop them from the cache, the rerun attaches to the new ones. Not closed here:
+    # other sessions may still be reading them until they notice and re-attach themselves
+    service.clear(); st.rerun()
+
+try:
+    frame_slot, state_slot, ctl = service()
+except FileNotFoundError:
+    st.warning("Vision service not running (python scripts/vision_service.py --source 0).")
+    if st.button("Start vision service"):
+        subprocess.Popen([sys.executable, os.path.join(os.path.dirname(os.path.abspath(__file__)), "vision_service.py"),
+                          "--source", "0"], start_new_session=True)
+        time.sleep(2.0); st.rerun()
+    st.stop()
+
+# a new session starts from the service's current settings and then sends only what it changes,
+# so opening a second browser tab doesn't reset the stage (and score) chosen in the first
+init = st.session_state.setdefault("ctl_init", dict(dict(stage=1, show_mask=True, show_prof=False,
+                                                         target_shape=None, target_color=None), **ctl.state))
+SHAPES, COLORS = [None, "circle", "square", "triangle"], [None, "red", "blue", "green"]
 col_left, col_right = st.columns([3,1])
 with col_right:
-    stage = st.selectbox("Stage", [1,2,3], index=0)
+    stage = st.selectbox("Stage", [1,2,3], index=int(init["stage"]) - 1)
+    # Stage 3 holds fire until both are set and a track matches them
+    target_shape = st.selectbox("Target shape", SHAPES, index=SHAPES.index(init["target_shape"]), disabled=stage != 3)
+    target_color = st.selectbox("Target color", COLORS, index=COLORS.index(init["target_color"]), disabled=stage != 3)
     accept = st.button("Engagement Accepted")
-    show_mask = st.checkbox("Show No-Fire Mask", value=True)
+    show_mask = st.checkbox("Show No-Fire Mask", value=init["show_mask"])
+    show_prof = st.checkbox("Show timings", value=init["show_prof"])
     run = st.checkbox("Run", value=False)
+    score_panel = st.empty(); engagement = st.empty(); status = st.empty()
 
 with col_left:
     stframe = st.empty()
 
-cap = cv2.VideoCapture(0)
-tracker = SortLite(iou_thresh=0.3, max_age=30)
-
-score = 0.0; base=0.0; t0=time.time()
+if st.session_state.get("ctl_pid") != frame_slot.pid:  # first run, or a new service: re-send what differs
+    st.session_state.ctl_pid = frame_slot.pid; st.session_state.ctl_sent = dict(ctl.state)
+sent = st.session_state.ctl_sent  # fields the service never got are sent too
+changed = {k: v for k, v in dict(stage=stage, show_mask=show_mask, show_prof=show_prof,
+                                 target_shape=target_shape, target_color=target_color).items() if sent.get(k) != v}
+if changed: ctl.send(**changed); sent.update(changed)
+if accept: ctl.send(accept=time.time_ns())  # a new nonce is one engagement
+frame_seq = state_seq = None; seen = time.monotonic()
 while run:
-    ok, frame = cap.read()
-    if not ok: st.write("Camera not available."); break
-    hsv = cv2.cvtColor(frame, cv2.COLOR_BGR2HSV)
-    m1 = cv2.inRange(hsv,(0,90,80),(10,255,255)); m2=cv2.inRange(hsv,(170,90,80),(180,255,255))
-    mr = cv2.bitwise_or(m1,m2); mb=cv2.inRange(hsv,(95,80,60),(130,255,255)); mg=cv2.inRange(hsv,(40,60,60),(85,255,255))
-    mask = cv2.bitwise_or(cv2.bitwise_or(mr,mb),mg)
-    mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3,3),np.uint8),1)
-    contours,_ = cv2.findContours(mask, cv2.RETR_EXTERNAL, cv2.CHAIN_APPROX_SIMPLE)
-    dets=[]
-    for c in contours:
-        if cv2.contourArea(c)<150: continue
-        x,y,w,h=cv2.boundingRect(c); dets.append([x,y,x+w,y+h])
-
-    tracks = tracker.update(dets)
-    for tid, box, stable in tracks:
-        x1,y1,x2,y2 = box.astype(int)
-        cv2.rectangle(frame,(x1,y1),(x2,y2),(0,255,255),2)
-        cv2.putText(frame,f"ID {tid}",(x1,y1-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,255,255),1)
-        # Demo: sample 'hit' logic when accepted and stable
-        if accept and stable>=3:
-            # In a real system, we'd check friend/foe, shape, and mask, then log the event.
-            base += 5.0  # placeholder increment (stage-specific handled in score harness)
-            accept = False
-
-    if show_mask:
-        overlay = frame.copy()
-        H,W=frame.shape[:2]
-        pts = np.array([[int(0.4*W),int(0.2*H)],[int(0.6*W),int(0.2*H)],[int(0.5*W),int(0.45*H)]], np.int32)
-        cv2.fillPoly(overlay,[pts],(0,0,255))
-        frame = cv2.addWeighted(overlay, 0.2, frame, 0.8, 0)
-
-    stframe.image(cv2.cvtColor(frame, cv2.COLOR_BGR2RGB), channels="RGB")
-
-cap.release()
+    if not frame_slot.alive() or time.monotonic() - seen > STALE_S: reattach()
+    frame_seq, jpg = frame_slot.read(frame_seq)
+    if jpg is not None: stframe.image(jpg)
+    state_seq, data = state_slot.read(state_seq)
+    if data is not None:
+        seen = time.monotonic(); s = json.loads(data); r = s["score"]
+        score_panel.markdown(f"**A{s['stage']}**  Base {r['base']:.0f}  BSP {r['bsp']:.1f}  **Total {r['total']:.1f}**  "
+                             f"Wrong {r['wrong']}" + ("  — FAILED" if r["failed"] else ""))
+        status.caption(f"vision {s['fps']:.0f} FPS, latency {s['latency_ms']:.0f} ms, {len(s['tracks'])} tracks"
+                       + (f", board {s['board']['conf']:.2f}" if s.get("board") else "")
+                       + ("  (stale)" if time.time() - s["t"] > 1.0 else ""))
+        e = s.get("engagement")
+        if e: engagement.markdown(f"Last engagement: **{e['result']}**" + (f" (ID {e['id']})" if e["id"] is not None else ""))
+    time.sleep(1.0 / UI_FPS)
@@ -2,6 +2,7 @@
 """
 Utility helpers for color ranges, drawing, and bbox conversion.
 """
+import os, glob
 import numpy as np
 
 def xywh_to_xyxy(x,y,w,h):
@@ -10,3 +11,18 @@ def xywh_to_xyxy(x,y,w,h):
 def xyxy_to_cxcywh(x1,y1,x2,y2):
     w = x2-x1; h = y2-y1; cx = x1 + w/2.0; cy = y1 + h/2.0
     return [cx,cy,w,h]
+
+def load_yolo_split(root):
+    # [(image path, Nx4 normalized cx,cy,w,h)] for a split laid out as images/*.jpg + labels/*.txt
+    items=[]
+    for img in sorted(glob.glob(os.path.join(root,"images","*.jpg"))):
+        lbl=os.path.join(root,"labels",os.path.splitext(os.path.basename(img))[0]+".txt")
+        rows=np.loadtxt(lbl, ndmin=2) if os.path.exists(lbl) and os.path.getsize(lbl) else np.zeros((0,5))
+        items.append((img, rows[:,1:5]))
+    return items
+
+def yolo_to_xyxy(rows, W, H):
+    # normalized cx,cy,w,h rows → pixel x1,y1,x2,y2 rows
+    rows=np.asarray(rows, dtype=float).reshape(-1,4)
+    return np.stack([(rows[:,0]-rows[:,2]/2)*W, (rows[:,1]-rows[:,3]/2)*H,
+                     (rows[:,0]+rows[:,2]/2)*W, (rows[:,1]+rows[:,3]/2)*H], 1)
@@ -0,0 +1,328 @@
+#!/usr/bin/env python3
+"""
+Vision service: the capture → detect → track → classify → score loop as its own long-lived
+process, so the Streamlit UI (ui_app.py) can rerun freely without touching camera or tracker.
+- Publishes through shared memory (ShmSlot: one writer, sequence-counter guarded, readers
+  never block it):
+    <name>_frame  latest annotated frame as JPEG, at --jpeg_fps / --quality / --preview_width,
+                  drawn and encoded only when due, the encoding on a publisher thread
+    <name>_state  JSON: loop fps/latency, tracks (id, box, color, conf, veto), score, board
+- Reads <name>_ctl, a JSON slot the UI writes: stage, show_mask, show_prof and an accept
+  nonce (a new value = "Engagement Accepted" pressed once), and the Stage-3 target_shape /
+  target_color. An accept applies to the next frame only: the first track passing the fire
+  gate is hit or vetoed; friend-colored (Stage 2) or off-spec (Stage 3) tracks are held. The
+  outcome (hit / veto / hold / no target) is printed and published as state["engagement"].
+
+  python scripts/vision_service.py --source 0 --jpeg_fps 10
+  python scripts/vision_service.py --source "synth://1280x720?n=20" --frames 600   # headless check
+"""
+import argparse, json, os, struct, threading, time
+from multiprocessing import shared_memory, resource_tracker
+import cv2, numpy as np
+from sort_tracker import SortLite
+from friend_foe_classifier import color_integrals, classify_boxes, is_fire_allowed, FRIEND_COLOR, MIN_CONF
+from shape_color_logic import roi_color_shape
+from score_harness import LiveScore
+from color_segment import get_lut
+from blob_features import blobs_from_mask
+from capture import CaptureSource
+from instrument import PROF
+from safety_gate import NoFireGate
+from target_board_detect import BoardTracker
+
+DEFAULT_NAME = "bap_vision"
+ASSETS = os.path.join(os.path.dirname(os.path.abspath(__file__)), "..", "assets")
+LATENCY_FRAMES = 3  # ~0.1 s actuation latency at 30 FPS
+
+def _alive(pid):
+    if pid <= 0: return False
+    try: os.kill(pid, 0)
+    except ProcessLookupError: return False
+    except PermissionError: pass
+    return True
+
+class ShmSlot:
+    """Latest-value byte slot in shared memory. The single writer bumps the sequence number to
+    odd before and to even after copying; readers retry if it moved (seqlock), so a reader
+    never sees a torn payload and the writer never waits for readers."""
+    HDR = struct.Struct("<QII")  # seq, payload size, pid of the creating process
+
+    def __init__(self, name, capacity=0, create=False):
+        if create:
+            try:
+                old = shared_memory.SharedMemory(name)
+            except FileNotFoundError:
+                pass
+            else:  # left behind by a run that crashed, or in use by a running service
+                pid = self.HDR.unpack_from(old.buf, 0)[2] if old.size >= self.HDR.size else 0
+                old.close()
+                if _alive(pid) and pid != os.getpid():
+                    resource_tracker.unregister(old._name, "shared_memory")  # not ours to unlink at exit
+                    raise FileExistsError(f"shared memory {name} is in use by process {pid}")
+                old.unlink()
+            self.shm = shared_memory.SharedMemory(name, create=True, size=self.HDR.size + capacity)
+            self.HDR.pack_into(self.shm.buf, 0, 0, 0, os.getpid())
+        else:
+            self.shm = shared_memory.SharedMemory(name)
+            # attaching registers the segment with this process's resource tracker, which would
+            # unlink it when the UI exits (Python < 3.13 has no track=False)
+            resource_tracker.unregister(self.shm._name, "shared_memory")
+        self.owner = create
+        self.capacity = self.shm.size - self.HDR.size
+        # a writer that attaches (the UI, possibly restarted) continues the sequence, so its
+        # first write can't repeat the seq a reader last saw; odd = a writer died mid-write
+        seq = struct.unpack_from("<Q", self.shm.buf, 0)[0]
+        self.seq = seq + (seq & 1); self.skipped = 0
+
+    def write(self, data):
+        if len(data) > self.capacity: self.skipped += 1; return False
+        buf = self.shm.buf
+        self.seq += 1; struct.pack_into("<Q", buf, 0, self.seq)  # odd: writing
+        buf[self.HDR.size:self.HDR.size + len(data)] = data
+        self.seq += 1; struct.pack_into("<QI", buf, 0, self.seq, len(data))
+        return True
+
+    def read(self, last_seq=None, tries=100):
+        """(seq, bytes), or (seq, None) if nothing new since last_seq / nothing written yet."""
+        buf = self.shm.buf
+        for _ in range(tries):
+            seq, size, _ = self.HDR.unpack_from(buf, 0)
+            if seq & 1: time.sleep(0); continue
+            if seq == 0 or seq == last_seq: return seq, None
+            data = bytes(buf[self.HDR.size:self.HDR.size + size])
+            if struct.unpack_from("<Q", buf, 0)[0] == seq: return seq, data
+        return last_seq, None
+
+    @property
+    def pid(self):
+        """Process that created the slot; a restarted service makes a new segment with a new pid."""
+        return self.HDR.unpack_from(self.shm.buf, 0)[2]
+
+    def alive(self):
+        return _alive(self.pid)
+
+    def close(self):
+        self.shm.close()
+        if self.owner: self.shm.unlink()
+
+class ControlWriter:
+    """UI side of <name>_ctl, shared by every session (thread) of one Streamlit server: each
+    session sends only the fields it changed; they are merged under a lock and the merged
+    control state is written whole, so the slot keeps a single writer and sessions don't
+    overwrite each other's settings."""
+    def __init__(self, slot):
+        self.slot = slot; self.lock = threading.Lock()
+        _, data = slot.read()
+        self.state = json.loads(data) if data else {}  # carry on from what the service last got
+
+    def send(self, **fields):
+        with self.lock:
+            if all(self.state.get(k) == v for k, v in fields.items()): return
+            self.state.update(fields)
+            self.slot.write(json.dumps(self.state).encode())
+
+def attach(name=DEFAULT_NAME):
+    """UI side: frame slot, state slot and ControlWriter of a running service
+    (FileNotFoundError if none, or only the segments of one that crashed)."""
+    slots = [ShmSlot(f"{name}_{k}") for k in ("frame", "state", "ctl")]
+    if not slots[0].alive():
+        for s in slots: s.close()
+        raise FileNotFoundError(f"shared memory {name}_frame was left by a service that is no longer running")
+    frame, state, ctl = slots
+    return frame, state, ControlWriter(ctl)
+
+class Publisher(threading.Thread):
+    """Takes the newest (annotated frame or None, state) from the loop and writes it to shared
+    memory; JPEG encoding happens here, off the loop. Older pending items are simply replaced."""
+    def __init__(self, frame_slot, state_slot, jpeg_fps=10.0, quality=80, width=0):
+        super().__init__(name="publisher", daemon=True)
+        self.frame_slot = frame_slot; self.state_slot = state_slot
+        self.period = 1.0 / jpeg_fps if jpeg_fps > 0 else None
+        self.params = [cv2.IMWRITE_JPEG_QUALITY, int(quality)]; self.width = width
+        self.cond = threading.Condition(); self._job = None; self._closing = False
+        self._next = 0.0; self.published = 0; self.encode_ms = 0.0
+
+    def due(self):
+        """Should the loop draw this frame? (JPEG period elapsed)"""
+        return self.period is not None and time.monotonic() >= self._next
+
+    def submit(self, frame, state):
+        with self.cond:
+            if frame is None and self._job is not None and self._job[0] is not None:
+                frame = self._job[0]  # don't let a state-only update drop a pending frame
+            self._job = (frame, state); self.cond.notify()
+        if frame is not None: self._next = time.monotonic() + self.period
+
+    def run(self):
+        while True:
+            with self.cond:
+                self.cond.wait_for(lambda: self._job is not None or self._closing)
+                if self._job is None: return
+                frame, state = self._job; self._job = None
+            self.state_slot.write(json.dumps(state).encode())
+            if frame is not None:
+                t = time.perf_counter()
+                if self.width and frame.shape[1] > self.width:
+                    frame = cv2.resize(frame, (self.width, frame.shape[0] * self.width // frame.shape[1]),
+                                       interpolation=cv2.INTER_AREA)
+                ok, jpg = cv2.imencode(".jpg", frame, self.params)
+                if ok: self.frame_slot.write(jpg); self.published += 1
+                self.encode_ms += (time.perf_counter() - t) * 1000
+
+    def stop(self):
+        with self.cond: self._closing = True; self.cond.notify()
+        self.join()
+
+class Pipeline:
+    """The former ui_app loop body: one call per frame, state in, (state dict, draw fn) out."""
+    def __init__(self, duration=300.0):
+        self.tracker = SortLite(iou_thresh=0.3, max_age=30)
+        self.gate = NoFireGate.from_json(os.path.join(ASSETS, "safety_zone_mask.json"))
+        self.board = BoardTracker()  # Stage-3 board: detected once, then tracked locally
+        self.duration = duration
+        # target_shape/target_color: the Stage-3 spec (shape + color must both match; none = hold)
+        self.ctl = dict(stage=1, show_mask=True, show_prof=False, accept=0, target_shape=None, target_color=None)
+        self.score = LiveScore(1, duration); self.t0 = time.time()
+        self._accept_seen = 0; self.pending_accept = False
+        self.engagement = None  # outcome of the last accept: {"accept", "result", "id"}
+
+    def control(self, ctl):
+        if ctl.get("stage", self.ctl["stage"]) != self.score.stage:
+            self.score = LiveScore(int(ctl["stage"]), self.duration); self.t0 = time.time()
+            self.board = BoardTracker()
+        if ctl.get("accept") and ctl["accept"] != self._accept_seen:
+            self._accept_seen = ctl["accept"]; self.pending_accept = True
+        if ctl.get("show_prof") and not PROF.enabled: PROF.enable()
+        self.ctl.update(ctl)
+
+    def step(self, frame):
+        # an accept is one-shot: it applies to this frame only and is gone whatever the outcome
+        stage = self.score.stage; accept = self.pending_accept; self.pending_accept = False
+        engaging = accept
+        if accept: self.engagement = dict(accept=self._accept_seen, result="no target", id=None)
+        with PROF.span("masking"):
+            labels = get_lut().labels(frame)  # also feeds the friend/foe classifier below
+            mask = get_lut().mask_from_labels(labels)
+        with PROF.span("morphology"): mask = cv2.morphologyEx(mask, cv2.MORPH_OPEN, np.ones((3,3),np.uint8),1)
+        with PROF.span("contours"): dets = [b.xyxy for b in blobs_from_mask(mask, 150)]
+        with PROF.span("tracking"): tracks = self.tracker.update(dets)
+        H,W = frame.shape[:2]
+        board_roi, board_conf = None, 0.0
+        if stage == 3:
+            with PROF.span("board"): board_roi, board_conf = self.board.update(frame)
+        with PROF.span("safety"): veto = self.gate.veto_tracks(self.tracker, LATENCY_FRAMES, W, H) if accept else {}
+        with PROF.span("classify"):
+            # only tracks whose color votes aren't settled (or are due a re-check) are classified,
+            # all at once from per-color integral images of the label image
+            due = self.tracker.classify_due()
+            if len(due):
+                _, colors, confs = classify_boxes(color_integrals(labels), self.tracker.boxes[due])
+                shapes = None
+                if stage == 3:  # the Stage-3 spec needs the shape too, from the same due tracks only
+                    b = np.clip(np.round(self.tracker.boxes[due]), 0, [W, H, W, H]).astype(int)
+                    shapes = [roi_color_shape(frame[y1:y2, x1:x2])[1] for x1, y1, x2, y2 in b]
+                self.tracker.vote(due, colors, shapes, weights=confs)
+            classes = self.tracker.class_labels()
+        spec = (self.ctl["target_shape"], self.ctl["target_color"])
+        out = []
+        for tid, box, stable in tracks:
+            color, conf, shape, conf_shape = classes[tid]
+            x1,y1,x2,y2 = (int(v) for v in box)
+            out.append(dict(id=int(tid), box=[x1,y1,x2,y2], stable=int(stable), color=color, conf=round(float(conf), 3),
+                            shape=shape, veto=bool(veto.get(tid))))
+            # Demo: once the engagement is accepted, the first stable track that passes the fire gate
+            # is engaged (id_stable >= 3, accumulated conf_color >= MIN_CONF; Stage 2: foe color only;
+            # Stage 3: shape + color spec, both confident). A veto ends the engagement; tracks that
+            # fail the gate are held, never fired on.
+            if not (accept and stable>=3 and conf >= MIN_CONF): continue
+            if stage == 2: ok = is_fire_allowed(color, conf)
+            elif stage == 3: ok = (shape, color) == spec and conf_shape >= MIN_CONF
+            else: ok = True
+            if not ok:
+                if self.engagement["result"] == "no target": self.engagement.update(result="hold", id=int(tid))
+                continue
+            accept = False; self.engagement.update(id=int(tid))
+            if veto.get(tid): self.engagement["result"] = "veto"; continue
+            size = "small" if (x2-x1)*(y2-y1) < 1200 else "big"  # cv_color_shape_detect area_small
+            self.score.hit(type=size, label="friend" if color == FRIEND_COLOR else "enemy", correct=True)
+            self.engagement["result"] = "hit"
+        if engaging:
+            e = self.engagement; who = f" ID {e['id']}" if e["id"] is not None else ""
+            print(f"{time.strftime('%H:%M:%S')} stage {stage} engagement: {e['result']}{who}")
+        self.score.tick(time.time()-self.t0)
+        r = self.score.result()
+        state = dict(stage=stage, tracks=out, score=dict(r, failed=bool(self.score.failed)), engagement=self.engagement,
+                     board=dict(roi=[int(v) for v in board_roi], conf=round(float(board_conf), 3)) if board_roi else None)
+
+        def draw():
+            for t in out:
+                x1,y1,x2,y2 = t["box"]
+                cv2.rectangle(frame,(x1,y1),(x2,y2),(0,255,255),2)
+                cv2.putText(frame,f"ID {t['id']} {t['color']} {t['conf']:.2f}" + (f" {t['shape']}" if stage == 3 else ""),(x1,y1-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,255,255),1)
+                if t["veto"]: cv2.putText(frame,"VETO",(x1,y2+14),cv2.FONT_HERSHEY_SIMPLEX,0.5,(0,0,255),1)
+            if board_roi is not None:
+                bx,by,bw,bh = board_roi
+                cv2.rectangle(frame,(bx,by),(bx+bw,by+bh),(255,0,255),2)
+                cv2.putText(frame,f"board {board_conf:.2f}",(bx,by-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(255,0,255),1)
+            if self.ctl["show_mask"]: self.gate.overlay(frame)
+            if self.ctl["show_prof"]: PROF.draw(frame)
+            return frame
+        return state, draw
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--source", default="0", help="webcam index, video path or synth:// URL")
+    ap.add_argument("--name", default=DEFAULT_NAME, help="shared-memory prefix (<name>_frame/_state/_ctl)")
+    ap.add_argument("--jpeg_fps", type=float, default=10.0, help="preview frames published per second (0 = none)")
+    ap.add_argument("--quality", type=int, default=80, help="preview JPEG quality")
+    ap.add_argument("--preview_width", type=int, default=960, help="downscale the preview to this width (0 = full)")
+    ap.add_argument("--frame_mb", type=float, default=4.0, help="frame slot capacity (MB)")
+    ap.add_argument("--frames", type=int, default=0, help="stop after N frames (0 = run until the source ends)")
+    args = ap.parse_args()
+
+    cap = CaptureSource(args.source)
+    if not cap.isOpened(): print(f"Cannot open source {args.source}"); return
+    try:
+        frame_slot = ShmSlot(f"{args.name}_frame", int(args.frame_mb * 2**20), create=True)
+        state_slot = ShmSlot(f"{args.name}_state", 1 << 18, create=True)
+        ctl_slot = ShmSlot(f"{args.name}_ctl", 1 << 12, create=True)
+    except FileExistsError as e:
+        print(f"{e}: another vision service is running (use --name for a second one)"); cap.release(); return
+    pub = Publisher(frame_slot, state_slot, args.jpeg_fps, args.quality, args.preview_width); pub.start()
+    pipe = Pipeline(); ctl_seq = 0
+    print(f"vision service '{args.name}' on {args.source}: preview {args.jpeg_fps:g} FPS (Ctrl+C to stop)")
+    n = 0; t_start = time.monotonic(); t_dump = time.time(); lat = []; fps = 0.0; last = t_start
+    try:
+        while not args.frames or n < args.frames:
+            PROF.frame()
+            with PROF.span("capture"): ok, frame, t_cap = cap.read_stamped()
+            if not ok: break
+            seq, data = ctl_slot.read(ctl_seq)  # a few bytes; the UI writes it on every rerun
+            if data is not None:
+                ctl_seq = seq
+                try: pipe.control(json.loads(data))
+                except ValueError: pass
+            state, draw = pipe.step(frame)
+            now = time.monotonic(); n += 1
+            fps = 0.9*fps + 0.1/max(now-last, 1e-6) if n > 1 else 0.0; last = now
+            lat.append((now - t_cap) * 1000)
+            state.update(frame=n, fps=round(fps, 1), latency_ms=round(lat[-1], 1), dropped=cap.dropped,
+                         published=pub.published, t=time.time())
+            with PROF.span("drawing"):
+                pub.submit(draw() if pub.due() else None, state)
+            if pipe.ctl["show_prof"] and time.time()-t_dump > 5.0:
+                PROF.dump("logs/vision_profile.json"); t_dump = time.time()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        pub.stop(); cap.release()
+        if PROF.enabled: PROF.dump("logs/vision_profile.json")
+        wall = max(time.monotonic() - t_start, 1e-6)
+        lat = np.array(lat or [0.0])
+        print(f"{n} frames in {wall:.1f} s = {n/wall:.1f} FPS  latency p50 {np.median(lat):.1f} ms  "
+              f"p95 {np.percentile(lat, 95):.1f} ms  previews {pub.published} "
+              f"(encode {pub.encode_ms/max(pub.published, 1):.1f} ms each, off-loop)")
+        for s in (frame_slot, state_slot, ctl_slot): s.close()
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,184 @@
+#!/usr/bin/env python3
+"""
+YOLO inference backends for the live scripts.
+- "ultralytics": YOLO(weights).predict (torch; heavy pre/post-processing per frame).
+- "onnx": exported model in ONNX Runtime (CPU) with preallocated letterbox/input
+  buffers and single-class NMS in NumPy. Selected automatically for *.onnx weights.
+Both return [x1,y1,x2,y2,score] rows in frame coordinates (what SortLite consumes).
+
+Export + latency comparison:
+  python scripts/yolo_backend.py --export --weights runs/train/yolo_balloon/weights/best.pt --imgsz 512 640
+  python scripts/yolo_backend.py --bench  --weights runs/train/yolo_balloon/weights/best.pt --imgsz 512 640
+"""
+import argparse, os, time
+import cv2, numpy as np
+
+def nms(boxes, scores, iou_thr=0.45, max_det=300):
+    # Greedy single-class NMS; boxes Nx4 xyxy. Returns kept indices, best first.
+    order = np.argsort(-scores)
+    areas = (boxes[:, 2] - boxes[:, 0]) * (boxes[:, 3] - boxes[:, 1])
+    keep = []
+    while order.size and len(keep) < max_det:
+        i = order[0]; keep.append(i)
+        rest = order[1:]
+        w = np.minimum(boxes[i, 2], boxes[rest, 2]) - np.maximum(boxes[i, 0], boxes[rest, 0])
+        h = np.minimum(boxes[i, 3], boxes[rest, 3]) - np.maximum(boxes[i, 1], boxes[rest, 1])
+        inter = np.clip(w, 0, None) * np.clip(h, 0, None)
+        iou = inter / (areas[i] + areas[rest] - inter + 1e-6)
+        order = rest[iou <= iou_thr]
+    return np.array(keep, dtype=int)
+
+class OnnxYOLO:
+    """YOLOv8 ONNX model on ONNX Runtime CPU. Call with a BGR frame → Nx5 array,
+    or .batch(frames) → list of Nx5 arrays in one session run (batch>1 / dynamic export)."""
+    def __init__(self, path, conf=0.25, iou=0.45, threads=0):
+        import onnxruntime as ort
+        so = ort.SessionOptions()
+        so.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+        if threads: so.intra_op_num_threads = threads
+        self.session = ort.InferenceSession(path, so, providers=["CPUExecutionProvider"])
+        inp = self.session.get_inputs()[0]
+        self.input_name = inp.name
+        self.imgsz = (int(inp.shape[2]), int(inp.shape[3]))  # exported with a static H,W
+        b = inp.shape[0]
+        self.max_batch = b if isinstance(b, int) and b > 0 else None  # None: dynamic batch
+        self.conf = conf; self.iou = iou
+        self._alloc(self.max_batch or 1)
+
+    def _alloc(self, n):
+        H, W = self.imgsz
+        self.canvas = [np.full((H, W, 3), 114, np.uint8) for _ in range(n)]  # letterbox buffers, reused
+        self.blob = np.empty((n, 3, H, W), np.float32)                       # network input, reused
+        self._geom = [None] * n
+
+    def _letterbox(self, frame, slot=0):
+        h, w = frame.shape[:2]
+        geom = self._geom[slot]
+        if geom is None or geom[0] != (h, w):
+            H, W = self.imgsz
+            r = min(H / h, W / w)
+            nh, nw = int(round(h * r)), int(round(w * r))
+            top, left = (H - nh) // 2, (W - nw) // 2
+            self.canvas[slot][:] = 114  # borders only need resetting when the geometry changes
+            geom = self._geom[slot] = ((h, w), r, top, left, nh, nw)
+        _, r, top, left, nh, nw = geom
+        canvas = self.canvas[slot]
+        canvas[top:top+nh, left:left+nw] = cv2.resize(frame, (nw, nh), interpolation=cv2.INTER_LINEAR)
+        # HWC BGR uint8 → CHW RGB float32 in [0,1], written into the preallocated blob
+        np.multiply(canvas.transpose(2, 0, 1)[::-1], 1.0 / 255, out=self.blob[slot], casting="unsafe")
+        return r, top, left
+
+    def _decode(self, p, frame_shape, r, top, left):
+        # p: (4+nc, anchors) raw head output for one image
+        scores = p[4:].max(0) if p.shape[0] > 5 else p[4]
+        keep = scores >= self.conf
+        if not keep.any(): return np.zeros((0, 5), np.float32)
+        c = p[:4, keep].T; scores = scores[keep]
+        boxes = np.concatenate([c[:, :2] - c[:, 2:] / 2, c[:, :2] + c[:, 2:] / 2], 1)
+        k = nms(boxes, scores, self.iou)
+        boxes = (boxes[k] - [left, top, left, top]) / r
+        h, w = frame_shape[:2]
+        boxes = np.clip(boxes, 0, [w, h, w, h])
+        return np.concatenate([boxes, scores[k, None]], 1).astype(np.float32)
+
+    def __call__(self, frame):
+        return self.batch([frame])[0]
+
+    def batch(self, frames):
+        step = self.max_batch or len(frames)
+        if self.max_batch is None and len(self.canvas) < step: self._alloc(step)
+        out = []
+        for i in range(0, len(frames), step):
+            chunk = frames[i:i+step]
+            geo = [self._letterbox(f, j) for j, f in enumerate(chunk)]
+            # fixed-batch models always take the full blob; dynamic ones only the used slots
+            blob = self.blob if self.max_batch else self.blob[:len(chunk)]
+            p = self.session.run(None, {self.input_name: blob})[0]
+            out += [self._decode(p[j], f.shape, *g) for j, (f, g) in enumerate(zip(chunk, geo))]
+        return out
+
+def yolo_predictor(weights, conf=0.25, imgsz=None):
+    """Detector fn(frame) → [x1,y1,x2,y2,score] rows; *.onnx weights use ONNX Runtime."""
+    model = None
+    if weights.endswith(".onnx"):
+        try:
+            model = OnnxYOLO(weights, conf=conf)
+            return model
+        except Exception as e:
+            print(f"ONNX Runtime backend not available ({e}). Install onnxruntime or use --det cv")
+    else:
+        try:
+            from ultralytics import YOLO
+            model = YOLO(weights)
+        except Exception as e:
+            print("Ultralytics not available. Install ultralytics or use --det cv")
+    kw = {"imgsz": imgsz} if imgsz else {}
+    def _batch(frames):
+        if model is None: return [np.zeros((0, 5), np.float32) for _ in frames]
+        # [x1,y1,x2,y2,score] rows; scores feed the ByteTrack second pass
+        return [np.concatenate([r.boxes.xyxy.cpu().numpy(), r.boxes.conf.cpu().numpy()[:,None]], 1)
+                for r in model.predict(list(frames), conf=conf, verbose=False, **kw)]
+    def _pred(frame):
+        return _batch([frame])[0]
+    _pred.batch = _batch
+    return _pred
+
+def predict_batch(pred, frames):
+    """Run a detector over several frames, in one batch when the backend supports it."""
+    if hasattr(pred, "batch"): return pred.batch(frames)
+    return [pred(f) for f in frames]
+
+def export_onnx(weights, imgsz, batch=1, dynamic=False, force=False):
+    """Export ultralytics weights to <weights stem>_<imgsz>[_b<batch>][_dyn].onnx next to the weights.
+    An existing export is reused only while it is newer than the weights (retraining re-exports)."""
+    out = os.path.splitext(weights)[0] + f"_{imgsz}" + (f"_b{batch}" if batch > 1 else "") + ("_dyn" if dynamic else "") + ".onnx"
+    if not force and os.path.exists(out) and os.path.getmtime(out) >= os.path.getmtime(weights): return out
+    from ultralytics import YOLO
+    path = YOLO(weights).export(format="onnx", imgsz=imgsz, batch=batch, dynamic=dynamic, simplify=True, opset=12)
+    os.replace(path, out)
+    return out
+
+def _time(fn, frame, iters):
+    fn(frame)  # warm-up
+    t = time.perf_counter()
+    for _ in range(iters): fn(frame)
+    return (time.perf_counter() - t) * 1000 / iters
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", default="runs/train/yolo_balloon/weights/best.pt")
+    ap.add_argument("--imgsz", type=int, nargs="+", default=[512, 640])
+    ap.add_argument("--export", action="store_true", help="export ONNX model(s) for each --imgsz")
+    ap.add_argument("--bench", action="store_true", help="latency: ultralytics vs ONNX Runtime")
+    ap.add_argument("--source", default="", help="image/video for the benchmark frame (default: noise)")
+    ap.add_argument("--iters", type=int, default=50)
+    ap.add_argument("--batch", type=int, default=1, help="also export/bench a batch-N model (multi-camera)")
+    ap.add_argument("--force", action="store_true", help="re-export even if the ONNX file is up to date")
+    args = ap.parse_args()
+
+    for s in args.imgsz:
+        if args.export or args.bench:
+            path = export_onnx(args.weights, s, force=args.force)
+            print(f"imgsz {s}: {path}")
+            if args.batch > 1: print(f"imgsz {s} batch {args.batch}: {export_onnx(args.weights, s, args.batch, force=args.force)}")
+    if not args.bench: return
+    frame = None
+    if args.source:
+        cap = cv2.VideoCapture(args.source); ok, frame = cap.read(); cap.release()
+    if frame is None:
+        frame = np.random.default_rng(0).integers(0, 256, (720, 1280, 3), dtype=np.uint8)
+    for s in args.imgsz:
+        ul = _time(yolo_predictor(args.weights, imgsz=s), frame, args.iters)
+        ox = _time(OnnxYOLO(export_onnx(args.weights, s)), frame, args.iters)
+        print(f"imgsz {s}: ultralytics {ul:7.2f} ms/frame   onnxruntime {ox:7.2f} ms/frame   ({ul/ox:.2f}x)")
+        if args.batch > 1:
+            frames = [frame] * args.batch
+            model = OnnxYOLO(export_onnx(args.weights, s, args.batch))
+            model.batch(frames); t = time.perf_counter()
+            for _ in range(args.iters): model.batch(frames)
+            bt = (time.perf_counter() - t) * 1000 / args.iters
+            print(f"imgsz {s}: batch {args.batch} onnxruntime {bt:7.2f} ms/batch = {bt/args.batch:7.2f} ms/frame "
+                  f"(vs {ox:.2f} ms/frame unbatched)")
+
+if __name__ == "__main__":
+    main()
@@ -1,45 +1,49 @@
 #!/usr/bin/env python3
 """
 Run YOLO inference on webcam/video and draw detections.
+- *.pt weights run through ultralytics, *.onnx weights through ONNX Runtime (yolo_backend).
+- Per-stage timings via instrument.PROF: --prof FILE exports p50/p95/p99, --hud draws them.
 """
 import argparse, time
-import cv2, numpy as np
-try:
-    from ultralytics import YOLO
-except Exception as e:
-    print("Ultralytics not available. Install with: pip install ultralytics")
-    raise
+import cv2
+from capture import CaptureSource
+from yolo_backend import yolo_predictor
+from instrument import PROF
 
 def main():
     ap = argparse.ArgumentParser()
     ap.add_argument("--weights", default="runs/train/yolo_balloon/weights/best.pt")
     ap.add_argument("--source", default="0")
     ap.add_argument("--conf", type=float, default=0.25)
+    ap.add_argument("--prof", default="", help="write per-stage latency percentiles at exit (.json or .csv)")
+    ap.add_argument("--hud", action="store_true", help="draw per-stage p50/p95/p99 on the frame")
     args = ap.parse_args()
 
-    model = YOLO(args.weights)
-    cap = cv2.VideoCapture(0 if args.source=="0" else args.source)
+    model = yolo_predictor(args.weights, conf=args.conf)
+    cap = CaptureSource(args.source)
     if not cap.isOpened(): print("ERROR opening source"); return
 
-    last=time.time(); frames=0
+    PROF.enable()  # frame timing drives the FPS readout; spans cost well under 1%
     while True:
-        ok, frame = cap.read()
+        PROF.frame()
+        with PROF.span("capture"): ok, frame, t_cap = cap.read_stamped()
         if not ok: break
-        res = model.predict(frame, conf=args.conf, verbose=False)[0]
-        for b in res.boxes.xyxy.cpu().numpy().astype(int):
-            x1,y1,x2,y2 = b[:4]
-            cv2.rectangle(frame,(x1,y1),(x2,y2),(255,0,0),2)
-            cv2.putText(frame,"balloon",(x1,y1-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(255,0,0),1,cv2.LINE_AA)
-
-        frames+=1; now=time.time()
-        if now-last>1.0:
-            fps=frames/(now-last); frames=0; last=now
-            cv2.putText(frame,f"FPS {fps:.1f}",(10,22),cv2.FONT_HERSHEY_SIMPLEX,0.6,(0,255,255),2,cv2.LINE_AA)
-
+        with PROF.span("inference"): dets = model(frame)
+        lat_ms = (time.monotonic()-t_cap)*1000  # glass-to-decision
+        with PROF.span("drawing"):
+            for b in dets:
+                x1,y1,x2,y2 = b[:4].astype(int)
+                cv2.rectangle(frame,(x1,y1),(x2,y2),(255,0,0),2)
+                cv2.putText(frame,"balloon",(x1,y1-6),cv2.FONT_HERSHEY_SIMPLEX,0.5,(255,0,0),1,cv2.LINE_AA)
+            cv2.putText(frame,f"FPS {PROF.fps():.1f}",(10,22),cv2.FONT_HERSHEY_SIMPLEX,0.6,(0,255,255),2,cv2.LINE_AA)
+            cv2.putText(frame,f"lat {lat_ms:.0f} ms  drop {cap.dropped}",(10,44),cv2.FONT_HERSHEY_SIMPLEX,0.6,(0,255,255),2,cv2.LINE_AA)
+            if args.hud: PROF.draw(frame, y=66)
         cv2.imshow("YOLO Inference", frame)
         if cv2.waitKey(1)&0xFF==27: break
 
     cap.release(); cv2.destroyAllWindows()
+    if args.prof:
+        PROF.dump(args.prof); print(f"profile → {args.prof} (overhead {PROF.overhead_pct():.2f}%)")
 
 if __name__ == "__main__":
     main()
@@ -0,0 +1,115 @@
+#!/usr/bin/env python3
+"""
+INT8 post-training quantization for the balloon YOLO model (ONNX Runtime static PTQ).
+- Exports the trained weights to FP32 ONNX (yolo_backend.export_onnx).
+- Calibrates activations on synthetic images (existing split dir, or freshly generated
+  with enhanced_synthetic_generator when --calib is missing).
+- Writes <weights stem>_<imgsz>_int8.onnx, usable anywhere via --weights (*.onnx → ONNX Runtime).
+- Reports latency, model size and mAP@0.5 delta vs FP32 on the val split → reports/quant_report.json.
+"""
+import argparse, os, json, time, glob, tempfile, random
+import cv2, numpy as np
+from yolo_backend import OnnxYOLO, export_onnx
+from sort_tracker import iou_matrix
+from utils import load_yolo_split, yolo_to_xyxy
+
+def calib_images(calib_dir, n):
+    paths = sorted(glob.glob(os.path.join(calib_dir, "*.jpg")))
+    if not paths:
+        # No split on disk: render calibration frames with the enhanced generator
+        from enhanced_synthetic_generator import gen_enhanced_image
+        calib_dir = tempfile.mkdtemp(prefix="calib_")
+        random.seed(0); np.random.seed(0)
+        print(f"No images in --calib, generating {n} into {calib_dir}")
+        paths = [gen_enhanced_image(calib_dir, calib_dir, i)[0] for i in range(n)]
+    return paths[:n]
+
+def quantize(fp32_path, out_path, paths, per_channel=True):
+    from onnxruntime.quantization import (CalibrationDataReader, CalibrationMethod, QuantFormat,
+                                          QuantType, quantize_static)
+    class Reader(CalibrationDataReader):
+        # Feeds letterboxed calibration images through the FP32 model's own preprocessing
+        def __init__(self):
+            self.pre = OnnxYOLO(fp32_path); self.it = iter(paths)
+        def get_next(self):
+            p = next(self.it, None)
+            if p is None: return None
+            self.pre._letterbox(cv2.imread(p))
+            return {self.pre.input_name: self.pre.blob.copy()}
+    from onnxruntime.quantization.shape_inference import quant_pre_process
+    # Shape inference + graph cleanup first, as ORT recommends for static PTQ
+    prep = os.path.splitext(out_path)[0] + "_prep.onnx"
+    quant_pre_process(fp32_path, prep, skip_symbolic_shape=True)  # exported with static shapes
+    quantize_static(prep, out_path, Reader(), quant_format=QuantFormat.QDQ,
+                    per_channel=per_channel, activation_type=QuantType.QUInt8,
+                    weight_type=QuantType.QInt8, calibrate_method=CalibrationMethod.MinMax)
+    os.remove(prep)
+    return out_path
+
+def average_precision(dets, gts, iou_thr=0.5):
+    """Single-class AP (all-point interpolation). dets/gts: per-image Nx5 / Mx4 arrays."""
+    recs = []; n_gt = sum(len(g) for g in gts)
+    for d, g in zip(dets, gts):
+        d = d[np.argsort(-d[:, 4])]
+        used = np.zeros(len(g), bool)
+        ious = iou_matrix(d[:, :4], g) if len(g) else np.zeros((len(d), 0))
+        for k in range(len(d)):
+            j = int(np.argmax(ious[k])) if len(g) else -1
+            tp = j >= 0 and ious[k, j] >= iou_thr and not used[j]
+            if tp: used[j] = True
+            recs.append((d[k, 4], tp))
+    if not recs or n_gt == 0: return 0.0
+    recs.sort(key=lambda r: -r[0])
+    tp = np.cumsum([r[1] for r in recs]); fp = np.cumsum([not r[1] for r in recs])
+    recall = tp / n_gt; precision = tp / np.maximum(tp + fp, 1)
+    mrec = np.concatenate([[0], recall, [1]]); mpre = np.concatenate([[1], precision, [0]])
+    mpre = np.maximum.accumulate(mpre[::-1])[::-1]
+    i = np.nonzero(mrec[1:] != mrec[:-1])[0]
+    return float(np.sum((mrec[i+1] - mrec[i]) * mpre[i+1]))
+
+def evaluate(model_path, val_items, iters=30):
+    model = OnnxYOLO(model_path, conf=0.001)
+    dets, gts = [], []
+    for img, gt in val_items:
+        frame = cv2.imread(img); H, W = frame.shape[:2]
+        dets.append(model(frame)); gts.append(yolo_to_xyxy(gt, W, H))
+    frame = cv2.imread(val_items[0][0])
+    model(frame); t = time.perf_counter()
+    for _ in range(iters): model(frame)
+    return dict(latency_ms=(time.perf_counter()-t)*1000/iters,
+                size_mb=os.path.getsize(model_path)/2**20,
+                map50=average_precision(dets, gts))
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument("--weights", default="runs/train/yolo_balloon/weights/best.pt", help=".pt (exported first) or FP32 .onnx")
+    ap.add_argument("--imgsz", type=int, default=512)
+    ap.add_argument("--calib", default="data/enhanced_synth_samples/train/images")
+    ap.add_argument("--n_calib", type=int, default=200)
+    ap.add_argument("--val", default="data/enhanced_synth_samples/val")
+    ap.add_argument("--per_tensor", action="store_true", help="per-tensor weights (default per-channel)")
+    ap.add_argument("--report", default="reports/quant_report.json")
+    ap.add_argument("--force", action="store_true", help="re-export the FP32 ONNX even if it is up to date")
+    args = ap.parse_args()
+
+    fp32 = args.weights if args.weights.endswith(".onnx") else export_onnx(args.weights, args.imgsz, force=args.force)
+    int8 = os.path.splitext(fp32)[0] + "_int8.onnx"
+    paths = calib_images(args.calib, args.n_calib)
+    print(f"Calibrating on {len(paths)} images → {int8}")
+    quantize(fp32, int8, paths, per_channel=not args.per_tensor)
+
+    val = load_yolo_split(args.val)
+    if not val:
+        print(f"No val split at {args.val}; skipping report. INT8 model: {int8}"); return
+    res = {"fp32": evaluate(fp32, val), "int8": evaluate(int8, val)}
+    res["delta"] = {k: res["int8"][k] - res["fp32"][k] for k in res["fp32"]}
+    res.update(fp32_model=fp32, int8_model=int8, imgsz=args.imgsz, n_calib=len(paths), n_val=len(val))
+    os.makedirs(os.path.dirname(args.report) or ".", exist_ok=True)
+    with open(args.report, "w") as f: json.dump(res, f, indent=2)
+    for k in ("fp32", "int8"):
+        r = res[k]
+        print(f"{k}: {r['latency_ms']:7.2f} ms  {r['size_mb']:6.2f} MB  mAP50={r['map50']:.4f}")
+    print(f"delta mAP50={res['delta']['map50']:+.4f}  → {args.report}")
+
+if __name__ == "__main__":
+    main()